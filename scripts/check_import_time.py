@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the generator CLIs
+
+Imports each script module in a fresh interpreter with `python -X importtime`
+and fails when its cold-start import time exceeds the budget, or when a
+module that should load lazily pulls in a heavy backend at import time.
+
+Usage:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --repeat 5
+    python scripts/check_import_time.py --scale 2.0
+    python scripts/check_import_time.py --module svg_helper
+"""
+
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Import-time budgets (milliseconds). The PDF generators import ReportLab
+# themselves; svg_helper and the diagram generator must stay light.
+IMPORT_BUDGETS_MS = {
+    'svg_helper': 150,
+    'generate_diagram_images': 150,
+    'generate_pdf': 600,
+    'generate_whitepaper_pdf': 600,
+    'generate_pdf_book_reportlab': 600,
+}
+
+# Backends that must only be imported on first use
+LAZY_BACKENDS = {
+    'svg_helper': ['reportlab', 'svglib', 'PIL', 'pdfrw', 'lxml'],
+    'generate_diagram_images': ['reportlab', 'svglib', 'PIL', 'pdfrw'],
+}
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """
+    Import a module in a fresh interpreter.
+    
+    Args:
+        module: Module name in the scripts directory (e.g., "svg_helper")
+    
+    Returns:
+        (cumulative import time in ms, top-level packages imported with it)
+    
+    Raises:
+        RuntimeError: If the module cannot be imported
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ['unknown error'])[-1]
+        raise RuntimeError(f"cannot import {module}: {error}")
+    
+    total_us = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        packages.add(match.group(4).split('.')[0])
+        if match.group(4) == module and len(match.group(3)) <= 1:
+            total_us = int(match.group(2))
+    if total_us is None:
+        raise RuntimeError(f"no import time reported for {module}")
+    return total_us / 1000, sorted(packages)
+
+
+def benchmark(modules: List[str], repeat: int = 3, scale: float = 1.0) -> Dict[str, Dict]:
+    """
+    Measure every module (best of `repeat` runs) against its budget.
+    
+    Args:
+        modules: Module names to check
+        repeat: Fresh-interpreter runs per module; the fastest one counts
+        scale: Multiplier for all budgets (e.g., 2.0 on slow CI machines)
+    
+    Returns:
+        Mapping of module name to a result dict (ms, budget_ms, eager, ok, error)
+    """
+    results = {}
+    for module in modules:
+        budget = IMPORT_BUDGETS_MS.get(module, 600) * scale
+        try:
+            runs = [measure_import(module) for _ in range(max(1, repeat))]
+        except RuntimeError as e:
+            results[module] = {'ms': None, 'budget_ms': budget, 'eager': [], 'ok': False,
+                               'error': str(e)}
+            continue
+        
+        best_ms = min(ms for ms, _ in runs)
+        eager = [name for name in LAZY_BACKENDS.get(module, []) if name in runs[0][1]]
+        results[module] = {
+            'ms': best_ms,
+            'budget_ms': budget,
+            'eager': eager,
+            'ok': best_ms <= budget and not eager,
+            'error': None,
+        }
+    return results
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description='Check cold-start import time of the generator CLIs'
+    )
+    parser.add_argument(
+        '--module',
+        action='append',
+        choices=sorted(IMPORT_BUDGETS_MS),
+        help='Module to check (repeatable; default: all generator CLIs)'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Runs per module, best one counts (default: 3)'
+    )
+    parser.add_argument(
+        '--scale',
+        type=float,
+        default=1.0,
+        help='Multiply every budget, e.g. 2.0 on slow machines (default: 1.0)'
+    )
+    args = parser.parse_args()
+    
+    modules = args.module or list(IMPORT_BUDGETS_MS)
+    print(f"⏱️  Measuring import time ({args.repeat} run(s) per module)...")
+    results = benchmark(modules, args.repeat, args.scale)
+    
+    failed = 0
+    for module, result in results.items():
+        if result['error']:
+            print(f"❌ {module}: {result['error']}")
+        elif result['eager']:
+            print(f"❌ {module}: {result['ms']:.0f} ms, imports {', '.join(result['eager'])} at startup")
+        elif not result['ok']:
+            print(f"❌ {module}: {result['ms']:.0f} ms (budget {result['budget_ms']:.0f} ms)")
+        else:
+            print(f"✅ {module}: {result['ms']:.0f} ms (budget {result['budget_ms']:.0f} ms)")
+        failed += not result['ok']
+    
+    if failed:
+        print(f"\n❌ {failed} module(s) over budget")
+        return 1
+    print(f"\n✅ All {len(results)} module(s) within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,46 +5,728 @@ Generate SVG/PNG images from Mermaid diagrams
 Usage:
     python scripts/generate_diagram_images.py
     python scripts/generate_diagram_images.py --format png --width 2400
+    python scripts/generate_diagram_images.py --format svg,png --png-scale 1,2
+    python scripts/generate_diagram_images.py --jobs 4
+    python scripts/generate_diagram_images.py --force
+    python scripts/generate_diagram_images.py --no-batch
+    python scripts/generate_diagram_images.py --watch
+    python scripts/generate_diagram_images.py --timeout 60 --retries 2 --failure-report failures.json
+    python scripts/generate_diagram_images.py --metrics-out build/diagram-metrics.ndjson
+    python scripts/generate_diagram_images.py --format svg,png --optimize --quantize 256
+    python scripts/generate_diagram_images.py --format svg,png --validate-svg
 """
 
+import hashlib
+import io
+import json
+import itertools
 import os
 import re
+import shutil
+import signal
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from importlib.util import find_spec
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import argparse
 
 
+MERMAID_CLI_PACKAGE = "@mermaid-js/mermaid-cli"
+SUPPORTED_FORMATS = ('svg', 'png', 'pdf')
+# PNG optimization needs Pillow; SVG minification does not
+PILLOW_AVAILABLE = find_spec('PIL') is not None
+
+# Long-lived Node.js renderer: launches one headless browser through the
+# Mermaid CLI's own puppeteer and renders JSON-line requests from stdin.
+# Each diagram is laid out once as SVG; PNG/PDF outputs are rasterized or
+# printed from that same SVG so every format comes from one render.
+# Every request gets its own browser context and time limit: a request that
+# runs out of time is answered with an error and only its pages are closed.
+BATCH_RENDERER_SCRIPT = r"""
+import { createRequire } from 'node:module';
+import { pathToFileURL } from 'node:url';
+import path from 'node:path';
+import readline from 'node:readline';
+import fs from 'node:fs/promises';
+
+const cliDir = process.argv[2];
+const require = createRequire(path.join(cliDir, 'package.json'));
+const { renderMermaid } = await import(pathToFileURL(path.join(cliDir, 'src', 'index.js')).href);
+const puppeteer = (await import(pathToFileURL(require.resolve('puppeteer')).href)).default;
+
+const browser = await puppeteer.launch({ headless: 'new' });
+// Puppeteer >= 22 renamed createIncognitoBrowserContext
+const newContext = (browser.createBrowserContext || browser.createIncognitoBrowserContext).bind(browser);
+const reply = (message) => process.stdout.write(JSON.stringify(message) + '\n');
+reply({ ready: true });
+
+async function writeFromSvg(context, svg, req, target) {
+  const page = await context.newPage();
+  try {
+    await page.setViewport({ width: req.width, height: req.height, deviceScaleFactor: target.scale });
+    await page.setContent(
+      `<!DOCTYPE html><html><body style="margin:0;background:${req.background}">${svg}</body></html>`);
+    const clip = await page.$eval('svg', (el) => {
+      const r = el.getBoundingClientRect();
+      return { x: Math.floor(r.left), y: Math.floor(r.top),
+               width: Math.ceil(r.width), height: Math.ceil(r.height) };
+    });
+    if (target.format === 'png') {
+      await page.screenshot({ path: target.output, clip, omitBackground: req.background === 'transparent' });
+    } else {
+      await page.pdf({ path: target.output, printBackground: req.background !== 'transparent',
+                       width: `${clip.width}px`, height: `${clip.height}px`, pageRanges: '1' });
+    }
+  } finally {
+    await page.close();
+  }
+}
+
+async function renderRequest(context, req) {
+  const { data } = await renderMermaid(context, req.definition, 'svg', {
+    viewport: { width: req.width, height: req.height, deviceScaleFactor: 1 },
+    backgroundColor: req.background,
+    mermaidConfig: { theme: req.theme },
+  });
+  const svg = Buffer.from(data).toString('utf8');
+  for (const target of req.outputs) {
+    if (target.format === 'svg') {
+      await fs.writeFile(target.output, data);
+    } else {
+      await writeFromSvg(context, svg, req, target);
+    }
+  }
+}
+
+const pending = new Set();
+const rl = readline.createInterface({ input: process.stdin });
+rl.on('line', (line) => {
+  const req = JSON.parse(line);
+  const job = (async () => {
+    const started = Date.now();
+    let context = null;
+    let timer = null;
+    try {
+      context = await newContext();
+      // The clock starts when this request starts rendering
+      const work = renderRequest(context, req);
+      work.catch(() => {});  // Rejects after a timeout closes the context
+      const limits = [work];
+      if (req.timeout_ms) {
+        limits.push(new Promise((_, reject) => {
+          timer = setTimeout(() => reject(new Error(`timed out after ${req.timeout_ms / 1000}s`)),
+                             req.timeout_ms);
+        }));
+      }
+      await Promise.race(limits);
+      reply({ id: req.id, ok: true, ms: Date.now() - started });
+    } catch (err) {
+      reply({ id: req.id, ok: false, error: String((err && err.message) || err) });
+    } finally {
+      clearTimeout(timer);
+      if (context) {
+        await context.close().catch(() => {});
+      }
+    }
+  })();
+  pending.add(job);
+  job.finally(() => pending.delete(job));
+});
+rl.on('close', async () => {
+  await Promise.allSettled([...pending]);
+  await browser.close();
+  process.exit(0);
+});
+"""
+
+
+# Mermaid reports invalid diagram source with these; retrying cannot help
+PERMANENT_ERROR_PATTERN = re.compile(r'(Parse|Lexical|Syntax) error|No diagram type detected',
+                                     re.IGNORECASE)
+
+
+# Approximate graph size for metrics: arrows/links and the ids they connect
+EDGE_PATTERN = re.compile(r'<?(?:-{2,}|={2,}|-\.+-|~{3})(?:>>|[>xo)])?|-(?:>>|>|x|\))')
+NODE_ID_PATTERN = re.compile(r'\b([A-Za-z_][\w]*)\s*(?=[\[({>]|\s*$|\s*(?:<|-|=|~|&|:|;))')
+NODE_DECLARATION_PATTERN = re.compile(r'^\s*(?:participant|actor|state|class|entity)\s+([\w]+)',
+                                      re.IGNORECASE)
+LABEL_PATTERN = re.compile(r'"[^"]*"|\|[^|]*\||\[[^\]]*\]|\([^)]*\)|\{[^}]*\}')
+FRONTMATTER_PATTERN = re.compile(r'\A---\s*\n.*?\n---\s*\n', re.DOTALL)
+NON_NODE_STATEMENTS = ('end', 'subgraph', 'style', 'classDef', 'class ', 'click', 'linkStyle',
+                       'direction', 'note', 'loop', 'alt', 'else', 'opt', 'par', 'rect',
+                       'activate', 'deactivate', 'autonumber', 'title', 'section',
+                       'dateFormat', 'axisFormat')
+
+
+def count_graph_elements(cleaned_content: str) -> Tuple[int, int]:
+    """
+    Estimate (nodes, edges) of a Mermaid diagram without a full parser.
+    
+    Labels and shapes are stripped first so arrows inside text are not
+    counted; good enough to compare diagrams and spot regressions.
+    """
+    nodes = set()
+    edges = 0
+    body = FRONTMATTER_PATTERN.sub('', cleaned_content)
+    lines = [l.strip() for l in body.splitlines()
+             if l.strip() and not l.strip().startswith('%%')]
+    for stripped in lines[1:]:  # First statement is the diagram type
+        if stripped.startswith(NON_NODE_STATEMENTS) and not EDGE_PATTERN.search(stripped):
+            continue
+        declaration = NODE_DECLARATION_PATTERN.match(stripped)
+        if declaration:
+            nodes.add(declaration.group(1))
+        unlabeled = LABEL_PATTERN.sub(' ', stripped)
+        line_edges = EDGE_PATTERN.findall(unlabeled)
+        if line_edges:
+            edges += len(line_edges)
+            for part in EDGE_PATTERN.split(unlabeled):
+                part = part.split(':')[0]  # Sequence/state messages
+                nodes.update(t for t in re.findall(r'[A-Za-z_]\w*', part)[:1])
+        elif LABEL_PATTERN.search(stripped):
+            match = re.match(r'\s*([A-Za-z_]\w*)\s*[\[({]', stripped)
+            if match:
+                nodes.add(match.group(1))
+    return len(nodes), edges
+
+
+SVG_COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.DOTALL)
+SVG_METADATA_PATTERN = re.compile(r'<metadata\b.*?</metadata>|<metadata\b[^>]*/>', re.DOTALL)
+SVG_LINE_INDENT_PATTERN = re.compile(r'[ \t]*\n\s*')
+
+
+def optimize_png(path: Path, quantize_colors: int = 0) -> Tuple[int, int]:
+    """
+    Recompress a PNG in place, dropping text/EXIF metadata chunks.
+    
+    Lossless unless quantize_colors > 0, which converts to a palette image
+    with at most that many colors. The file is only replaced when smaller.
+    
+    Returns:
+        (bytes before, bytes after)
+    """
+    from PIL import Image as PILImage
+    
+    before = path.stat().st_size
+    with PILImage.open(path) as img:
+        img.load()
+        dpi = img.info.get('dpi')
+        if quantize_colors and img.mode != 'P':
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+            # Median cut gives better palettes but does not support alpha
+            method = 2 if img.mode == 'RGBA' else 0  # FASTOCTREE / MEDIANCUT
+            img = img.quantize(colors=quantize_colors, method=method)
+        buffer = io.BytesIO()
+        # No pnginfo/exif arguments: tEXt, iTXt, zTXt and eXIf chunks are dropped
+        save_kwargs = {'optimize': True}
+        if dpi:
+            save_kwargs['dpi'] = dpi
+        img.save(buffer, 'PNG', **save_kwargs)
+    
+    data = buffer.getvalue()
+    if len(data) >= before:
+        return before, before
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return before, len(data)
+
+
+def minify_svg(path: Path) -> Tuple[int, int]:
+    """
+    Strip comments, <metadata> and line indentation from an SVG in place.
+    
+    Whitespace runs that contain a newline are reduced to a single newline,
+    which renders identically under default XML/HTML whitespace handling;
+    files that opt into preserved whitespace are left untouched.
+    
+    Returns:
+        (bytes before, bytes after)
+    """
+    original = path.read_text(encoding='utf-8')
+    before = len(original.encode('utf-8'))
+    if 'xml:space="preserve"' in original or '<pre' in original:
+        return before, before
+    
+    text = SVG_COMMENT_PATTERN.sub('', original)
+    text = SVG_METADATA_PATTERN.sub('', text)
+    text = SVG_LINE_INDENT_PATTERN.sub('\n', text).strip()
+    data = text.encode('utf-8')
+    if len(data) >= before:
+        return before, before
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return before, len(data)
+
+
+def rendering_path(output: Path) -> Path:
+    """
+    Temporary file a render writes before replacing output.
+    
+    Hidden and per thread, with the output's extension (mmdc picks the
+    format from it).
+    """
+    return output.with_name(f".{output.stem}.{os.getpid()}-{threading.get_ident()}"
+                            f".rendering{output.suffix}")
+
+
+def link_output(source: Path, destination: Path):
+    """
+    Make destination the same image as source: a hard link where the
+    filesystem allows it, a copy otherwise.
+    
+    Args:
+        source: Rendered canonical output
+        destination: Output path of the duplicate diagram
+    """
+    if destination.exists():
+        if os.path.samefile(source, destination):
+            return
+        destination.unlink()
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def process_group_kwargs() -> Dict:
+    """Popen kwargs that start a child in its own process group (for tree kills)."""
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def kill_process_tree(process: subprocess.Popen):
+    """Kill a renderer and everything it spawned (Node, headless Chromium, npx shell)."""
+    if process.poll() is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                           capture_output=True, check=False)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+
+
+def renderer_environment(memory_limit_mb: int) -> Optional[Dict[str, str]]:
+    """Environment for renderer processes, capping the Node.js heap if requested."""
+    if memory_limit_mb <= 0:
+        return None
+    env = dict(os.environ)
+    env['NODE_OPTIONS'] = (env.get('NODE_OPTIONS', '') +
+                           f" --max-old-space-size={memory_limit_mb}").strip()
+    return env
+
+
+def find_mermaid_cli_package(mermaid_cmd: str) -> Optional[Path]:
+    """
+    Locate the installed @mermaid-js/mermaid-cli package directory.
+    
+    Args:
+        mermaid_cmd: "mmdc" (global install) or "npx" (npx cache)
+        
+    Returns:
+        Package directory if found, None otherwise
+    """
+    candidates = []
+    
+    if mermaid_cmd == "mmdc":
+        # Global bin is a symlink (or .cmd shim) into the package directory
+        mmdc_path = shutil.which('mmdc')
+        if mmdc_path:
+            resolved = Path(os.path.realpath(mmdc_path))
+            candidates.extend(resolved.parents)
+            # Windows shims live next to node_modules
+            candidates.append(Path(mmdc_path).parent / "node_modules" / MERMAID_CLI_PACKAGE)
+    else:
+        # npx installs into ~/.npm/_npx/<hash>/node_modules
+        npx_cache = Path.home() / ".npm" / "_npx"
+        installs = sorted(npx_cache.glob(f"*/node_modules/{MERMAID_CLI_PACKAGE}"),
+                          key=lambda p: p.stat().st_mtime, reverse=True)
+        candidates.extend(installs)
+    
+    for candidate in candidates:
+        package_json = candidate / "package.json"
+        if not package_json.exists():
+            continue
+        try:
+            with open(package_json, 'r', encoding='utf-8') as f:
+                if json.load(f).get('name') == MERMAID_CLI_PACKAGE:
+                    return candidate
+        except (OSError, ValueError):
+            continue
+    
+    return None
+
+
+class RendererInterrupted(RuntimeError):
+    """The shared renderer was killed because another request stopped answering."""
+
+
+class MermaidBatchRenderer:
+    """Render many diagrams through one long-lived Node.js + headless browser process."""
+    
+    STARTUP_TIMEOUT = 120  # seconds (first Chromium launch can be slow)
+    # Extra wait past a request's own time limit before the renderer counts
+    # as unresponsive and is killed
+    RESPONSE_GRACE = 30  # seconds
+    
+    def __init__(self, cli_dir: Path, memory_limit_mb: int = 0):
+        self.cli_dir = cli_dir
+        self.memory_limit_mb = memory_limit_mb
+        self.process = None
+        self.error = ""
+        self._script_path = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._write_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._started = False
+        self._killed = False  # Set by kill(): in-flight requests were interrupted
+        self._stderr_tail = deque(maxlen=20)
+    
+    def start(self) -> bool:
+        """Launch the renderer and wait until its browser is up."""
+        if not shutil.which('node'):
+            self.error = "node not found"
+            return False
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.mjs', delete=False,
+                                        encoding='utf-8') as tmp:
+            tmp.write(BATCH_RENDERER_SCRIPT)
+            self._script_path = tmp.name
+        
+        try:
+            self.process = subprocess.Popen(
+                ['node', self._script_path, str(self.cli_dir)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, encoding='utf-8', bufsize=1,
+                env=renderer_environment(self.memory_limit_mb),
+                **process_group_kwargs()
+            )
+        except OSError as e:
+            self.error = str(e)
+            self._cleanup_script()
+            return False
+        
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+        
+        if not self._ready.wait(self.STARTUP_TIMEOUT) or not self._started:
+            self.error = self._last_error() or "startup timed out"
+            self.close()
+            return False
+        return True
+    
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+    
+    def render(self, definition: str, targets: List[Dict], options: Dict,
+               timeout: Optional[float] = None) -> Tuple[bool, str, Optional[float]]:
+        """
+        Render one cleaned diagram definition to every target (thread-safe).
+        
+        Args:
+            definition: Cleaned Mermaid source
+            targets: Dicts with 'format', 'scale' and 'output' (Path)
+            options: Shared render options (theme, background, width, height)
+            timeout: Render time limit in seconds, enforced by the renderer for
+                this request only; the process is killed only if it stops answering
+            
+        Returns:
+            (success, error message, seconds spent rendering inside the browser)
+            
+        Raises:
+            RendererInterrupted: The renderer was killed for another request
+        """
+        request_id = next(self._ids)
+        future = Future()
+        outputs = [{'format': t['format'], 'scale': t['scale'],
+                    'output': str(Path(t['output']).resolve())} for t in targets]
+        request = dict(options, id=request_id, definition=definition, outputs=outputs,
+                       timeout_ms=int(timeout * 1000) if timeout else 0)
+        
+        with self._write_lock:
+            if not self.process or self.process.poll() is not None:
+                if self._killed:
+                    raise RendererInterrupted("renderer was restarted")
+                return False, f"renderer exited: {self._last_error()}", None
+            self._pending[request_id] = future
+            try:
+                self.process.stdin.write(json.dumps(request) + '\n')
+                self.process.stdin.flush()
+            except OSError as e:
+                self._pending.pop(request_id, None)
+                return False, f"renderer unavailable: {e}", None
+        
+        try:
+            reply = future.result(timeout=timeout + self.RESPONSE_GRACE if timeout else None)
+        except FutureTimeout:
+            # No answer even after the renderer's own time limit: the browser is
+            # wedged, so kill it (the caller restarts it)
+            self._pending.pop(request_id, None)
+            self.kill()
+            return False, f"timed out after {timeout:g}s (renderer unresponsive)", None
+        if reply.get('interrupted'):
+            raise RendererInterrupted(reply.get('error', ""))
+        renderer_seconds = reply['ms'] / 1000 if 'ms' in reply else None
+        return bool(reply.get('ok')), reply.get('error', ""), renderer_seconds
+    
+    def kill(self):
+        """Kill the renderer process tree immediately (in-flight renders are interrupted)."""
+        self._killed = True
+        if self.process:
+            kill_process_tree(self.process)
+        self._cleanup_script()
+    
+    def close(self):
+        """Finish in-flight renders and shut the browser down."""
+        if self.process:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=30)
+            except (OSError, subprocess.TimeoutExpired):
+                kill_process_tree(self.process)
+        self._cleanup_script()
+    
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get('ready'):
+                self._started = True
+                self._ready.set()
+                continue
+            future = self._pending.pop(message.get('id'), None)
+            if future:
+                future.set_result(message)
+        
+        # Process exited: fail anything still waiting (not their fault if killed)
+        self._ready.set()
+        if self._killed:
+            result = {'ok': False, 'interrupted': True,
+                      'error': "renderer killed after another diagram stopped responding"}
+        else:
+            result = {'ok': False, 'error': f"renderer exited: {self._last_error()}"}
+        for request_id in list(self._pending):
+            self._pending.pop(request_id).set_result(dict(result))
+    
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            if line.strip():
+                self._stderr_tail.append(line.strip())
+    
+    def _last_error(self) -> str:
+        return self._stderr_tail[-1] if self._stderr_tail else ""
+    
+    def _cleanup_script(self):
+        if self._script_path:
+            try:
+                os.unlink(self._script_path)
+            except OSError:
+                pass
+            self._script_path = None
+
+
 class DiagramImageGenerator:
     """Convert Mermaid .mmd files to SVG/PNG images."""
     
     def __init__(self, diagrams_dir: str = "DIAGRAMS",
                  output_dir: str = "DIAGRAMS/images",
                  format: str = "svg",
+                 png_scales: Optional[List[float]] = None,
                  width: int = 1920,
                  height: int = 0,
                  background: str = "white",
                  theme: str = "default",
-                 skip_existing: bool = False):
+                 skip_existing: bool = False,
+                 jobs: int = 0,
+                 force: bool = False,
+                 use_batch: bool = True,
+                 watch: bool = False,
+                 debounce: float = 0.5,
+                 timeout: float = 120,
+                 retries: int = 2,
+                 memory_limit_mb: int = 0,
+                 failure_report: Optional[str] = None,
+                 metrics_out: Optional[str] = None,
+                 optimize: bool = False,
+                 quantize_colors: int = 0,
+                 validate_svg: bool = False):
         self.diagrams_dir = Path(diagrams_dir)
         self.output_dir = Path(output_dir)
-        self.format = format
+        # One or more output formats, e.g. "svg" or "svg,png"
+        self.formats = [f.strip() for f in format.split(',') if f.strip()]
+        self.png_scales = list(dict.fromkeys(float(s) for s in png_scales or [1.0]))
         self.width = width
         self.height = height
         self.background = background
         self.theme = theme
         self.skip_existing = skip_existing
+        # 0 = one worker per CPU core; each worker drives its own mmdc process
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.force = force
+        self.use_batch = use_batch
+        self.watch = watch
+        self.debounce = debounce
+        self.poll_interval = 0.5  # seconds between watch-mode directory scans
+        
+        # Render queue limits: per-attempt wall clock, bounded retries, Node heap cap
+        self.timeout = timeout if timeout > 0 else None
+        self.retries = max(0, retries)
+        self.retry_backoff = 1.0  # seconds, doubled after every failed attempt
+        self.memory_limit_mb = memory_limit_mb
+        self.failure_report = Path(failure_report) if failure_report else None
+        self.failures: List[Dict] = []
+        self._renderer_lock = threading.Lock()
+        
+        # Per-diagram build metrics (--metrics-out)
+        self.metrics_out = Path(metrics_out) if metrics_out else None
+        self.metrics: List[Dict] = []
+        self.renderer_startup_seconds: Optional[float] = None
+        
+        # Post-render optimization (--optimize / --quantize). Decided once here,
+        # before any cache key is computed, and never changed during a run
+        self.optimize = optimize or quantize_colors > 0
+        self.optimize_png = self.optimize and PILLOW_AVAILABLE
+        self.quantize_colors = quantize_colors if self.optimize_png else 0
+        if self.optimize and not PILLOW_AVAILABLE and 'png' in self.formats:
+            print("⚠️  Pillow not installed, skipping PNG optimization (pip install pillow)")
+        
+        # Trial-render SVGs for the PDF builders (--validate-svg, needs svglib)
+        self.validate_svg = validate_svg
+        self.bytes_saved = 0
+        self.batch_renderer: Optional[MermaidBatchRenderer] = None
+        
+        # Render cache: output path -> hash of everything that affects the image
+        self.cache_file = self.output_dir / ".render-cache.json"
+        self.render_cache = {}
+        self.mermaid_version = "unknown"
+        
+        # Discovered renderer, reused across runs until PATH or the binary changes
+        self.toolchain_file = self.output_dir / ".toolchain.json"
+        self.toolchain: Dict = {}
+        
+        # Diagrams whose cleaned source duplicates another: alias stem -> canonical stem
+        self.aliases_file = self.output_dir / "aliases.json"
+        self.aliases: Dict[str, str] = {}
         
         self.total_converted = 0
         self.total_skipped = 0
+        self.total_aliased = 0
         self.total_failed = 0
         
+        # Guards counters and console output when rendering concurrently
+        self._lock = threading.Lock()
+    
+    def _log(self, message: str):
+        """Print a message without interleaving output from other workers."""
+        with self._lock:
+            print(message)
+    
+    def _record(self, status: str):
+        """Increment the counter for a conversion outcome (thread-safe)."""
+        with self._lock:
+            if status == 'converted':
+                self.total_converted += 1
+            elif status == 'skipped':
+                self.total_skipped += 1
+            elif status == 'aliased':
+                self.total_aliased += 1
+            else:
+                self.total_failed += 1
+        
     def check_mermaid_cli(self) -> Optional[str]:
-        """Check if Mermaid CLI is available."""
+        """Check if Mermaid CLI is available (cached in the toolchain file)."""
         print("ℹ️  Checking for Mermaid CLI...")
         
+        toolchain = self.load_toolchain()
+        if toolchain:
+            print(f"✅ Using cached Mermaid CLI: {toolchain['version']} ({toolchain['path']})")
+            self.toolchain = toolchain
+            self.mermaid_version = toolchain['version']
+            return toolchain['command']
+        
+        mermaid_cmd = self.probe_mermaid_cli()
+        if mermaid_cmd:
+            if mermaid_cmd == "npx":
+                self.mermaid_version = self.resolve_npx_version()
+            binary = shutil.which('mmdc' if mermaid_cmd == "mmdc" else
+                                  ('npx' if sys.platform != 'win32' else 'npx.cmd'))
+            cli_dir = find_mermaid_cli_package(mermaid_cmd)
+            self.toolchain = {
+                'command': mermaid_cmd,
+                'path': os.path.abspath(binary) if binary else mermaid_cmd,
+                'version': self.mermaid_version,
+                'cli_dir': str(cli_dir) if cli_dir else None,
+            }
+            self.save_toolchain()
+        return mermaid_cmd
+    
+    def _toolchain_environment(self, binary_path: str) -> Dict:
+        """State that invalidates the toolchain cache when it changes."""
+        try:
+            mtime = os.stat(binary_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return {
+            'path_env': hashlib.sha256(os.environ.get('PATH', '').encode('utf-8')).hexdigest(),
+            'mtime': mtime,
+        }
+    
+    def load_toolchain(self) -> Optional[Dict]:
+        """Return the cached toolchain if PATH and the binary are unchanged."""
+        try:
+            with open(self.toolchain_file, 'r', encoding='utf-8') as f:
+                toolchain = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not isinstance(toolchain, dict) or not all(
+                k in toolchain for k in ('command', 'path', 'version', 'env')):
+            return None
+        if toolchain['env'] != self._toolchain_environment(toolchain['path']):
+            return None
+        if toolchain.get('cli_dir') and not Path(toolchain['cli_dir']).exists():
+            return None
+        return toolchain
+    
+    def save_toolchain(self):
+        """Persist the discovered toolchain next to the generated images."""
+        self.toolchain['env'] = self._toolchain_environment(self.toolchain['path'])
+        self.toolchain['fingerprint'] = self.toolchain_fingerprint()
+        try:
+            self.toolchain_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.toolchain_file, 'w', encoding='utf-8') as f:
+                json.dump(self.toolchain, f, indent=2)
+                f.write('\n')
+        except OSError as e:
+            print(f"⚠️  Could not write toolchain cache: {e}")
+    
+    def toolchain_fingerprint(self) -> str:
+        """Identify the renderer build; part of every render cache key."""
+        payload = json.dumps({'package': MERMAID_CLI_PACKAGE, 'version': self.mermaid_version})
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    def probe_mermaid_cli(self) -> Optional[str]:
+        """Probe PATH for mmdc, then npx."""
         # Check for mmdc globally
         try:
             result = subprocess.run(['mmdc', '--version'], 
@@ -53,6 +735,7 @@ class DiagramImageGenerator:
             if result.returncode == 0:
                 version = result.stdout.strip()
                 print(f"✅ Found Mermaid CLI: {version}")
+                self.mermaid_version = version
                 return "mmdc"
         except (FileNotFoundError, subprocess.TimeoutExpired):
             pass
@@ -105,44 +788,122 @@ class DiagramImageGenerator:
         # Already clean
         return content.strip()
     
-    def convert_diagram(self, mmd_file: Path, mermaid_cmd: str) -> bool:
-        """Convert a single Mermaid diagram to image."""
-        file_name = mmd_file.name
-        output_subdir = self.output_dir / self.format
-        output_file = output_subdir / f"{mmd_file.stem}.{self.format}"
+    def resolve_npx_version(self) -> str:
+        """Ask the npx-provided Mermaid CLI for its version (used in cache keys)."""
+        try:
+            result = subprocess.run('npx -y -p @mermaid-js/mermaid-cli mmdc --version',
+                                  capture_output=True, text=True, check=False,
+                                  timeout=120, shell=True)
+            if result.returncode == 0 and result.stdout.strip():
+                return result.stdout.strip().splitlines()[-1]
+        except subprocess.TimeoutExpired:
+            pass
+        return "unknown"
+    
+    def load_render_cache(self):
+        """Load the render cache manifest (missing or corrupt = empty)."""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.render_cache = data.get('entries', {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            self.render_cache = {}
+    
+    def save_render_cache(self):
+        """Write the render cache manifest atomically."""
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix('.json.tmp')
+        with self._lock:
+            data = {'version': 1, 'entries': dict(sorted(self.render_cache.items()))}
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+        os.replace(tmp_file, self.cache_file)
+    
+    def load_aliases(self):
+        """Load the alias manifest (missing or corrupt = no aliases)."""
+        try:
+            with open(self.aliases_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.aliases = data.get('aliases', {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            self.aliases = {}
+    
+    def save_aliases(self):
+        """Write the alias manifest atomically (read by svg_helper and the PDF builders)."""
+        self.aliases_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.aliases_file.with_suffix('.json.tmp')
+        with self._lock:
+            data = {'version': 1, 'aliases': dict(sorted(self.aliases.items()))}
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+        os.replace(tmp_file, self.aliases_file)
+    
+    def render_cache_key(self, cleaned_content: str, target: Dict) -> str:
+        """Hash the cleaned source together with every option that changes the output."""
+        options = {
+            'source': cleaned_content,
+            'theme': self.theme,
+            'background': self.background,
+            'width': self.width,
+            'height': self.height,
+            'format': target['format'],
+            'scale': target['scale'],
+            'toolchain': self.toolchain_fingerprint(),
+        }
+        # Only post-processed formats depend on --optimize / --quantize
+        if target['format'] == 'png':
+            options.update(optimize=self.optimize_png, quantize=self.quantize_colors)
+        elif target['format'] == 'svg':
+            options['optimize'] = self.optimize
+        payload = json.dumps(options, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def output_targets(self, stem: str) -> List[Dict]:
+        """All files to produce for one diagram: every format, and every scale for PNG."""
+        targets = []
+        for fmt in self.formats:
+            for scale in (self.png_scales if fmt == 'png' else [1.0]):
+                # Always a float: the scale is hashed into the render cache key
+                scale = float(scale)
+                suffix = "" if scale == 1 else f"@{scale:g}x"
+                targets.append({
+                    'format': fmt,
+                    'scale': scale,
+                    'output': self.output_dir / fmt / f"{stem}{suffix}.{fmt}",
+                })
+        return targets
+    
+    def _render_with_subprocess(self, cleaned_content: str, targets: List[Dict],
+                                mermaid_cmd: str) -> Tuple[bool, str, Optional[float]]:
+        """
+        Render one diagram by launching a dedicated mmdc process per target
+        (fallback path; each format is laid out separately here).
         
-        # Check if should skip
-        if self.skip_existing and output_file.exists():
-            print(f"⏭️  Skipping {file_name} (already exists)")
-            self.total_skipped += 1
-            return True
+        mmdc does not report its own render time, so the third element
+        (in-browser seconds) is always None on this path.
+        """
+        # Create temporary file with cleaned content
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.mmd', 
+                                        delete=False, encoding='utf-8') as tmp:
+            tmp.write(cleaned_content)
+            tmp_path = tmp.name
         
-        print(f"ℹ️  Converting {file_name}...")
+        deadline = time.monotonic() + self.timeout if self.timeout else None
         
         try:
-            # Read and clean content
-            with open(mmd_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            cleaned_content = self.clean_mermaid_content(content)
-            
-            # Create temporary file with cleaned content
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.mmd', 
-                                            delete=False, encoding='utf-8') as tmp:
-                tmp.write(cleaned_content)
-                tmp_path = tmp.name
+            # Build command
+            if mermaid_cmd == "mmdc":
+                cmd = ['mmdc']
+            else:
+                # Use shell=True on Windows for npx
+                cmd = 'npx -y -p @mermaid-js/mermaid-cli mmdc'
             
-            try:
-                # Build command
-                if mermaid_cmd == "mmdc":
-                    cmd = ['mmdc']
-                else:
-                    # Use shell=True on Windows for npx
-                    cmd = 'npx -y -p @mermaid-js/mermaid-cli mmdc'
-                
+            for target in targets:
                 cmd_args = [
                     '-i', tmp_path,
-                    '-o', str(output_file),
+                    '-o', str(target['output']),
                     '-t', self.theme,
                     '-b', self.background
                 ]
@@ -153,39 +914,350 @@ class DiagramImageGenerator:
                 if self.height > 0:
                     cmd_args.extend(['-H', str(self.height)])
                 
-                # Execute conversion
+                if target['scale'] != 1:
+                    cmd_args.extend(['-s', f"{target['scale']:g}"])
+                
+                # Execute conversion in its own process group so a timeout
+                # can take down the headless browser along with mmdc
                 if isinstance(cmd, list):
-                    cmd.extend(cmd_args)
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+                    process = subprocess.Popen(cmd + cmd_args, stdout=subprocess.PIPE,
+                                               stderr=subprocess.PIPE, text=True,
+                                               env=renderer_environment(self.memory_limit_mb),
+                                               **process_group_kwargs())
                 else:
                     # Build full command string for shell execution
                     full_cmd = f"{cmd} {' '.join(cmd_args)}"
-                    result = subprocess.run(full_cmd, capture_output=True, text=True, 
-                                          check=False, shell=True)
+                    process = subprocess.Popen(full_cmd, stdout=subprocess.PIPE,
+                                               stderr=subprocess.PIPE, text=True, shell=True,
+                                               env=renderer_environment(self.memory_limit_mb),
+                                               **process_group_kwargs())
                 
-                if result.returncode == 0 and output_file.exists():
-                    file_size_kb = output_file.stat().st_size / 1024
-                    print(f"✅ ✓ {file_name} → {file_size_kb:.1f} KB")
-                    self.total_converted += 1
-                    return True
-                else:
-                    error_msg = result.stderr.strip() if result.stderr else "Unknown error"
-                    print(f"❌ Conversion failed: {error_msg[:100]}")
-                    self.total_failed += 1
-                    return False
-                    
-            finally:
-                # Clean up temp file
+                remaining = max(0.0, deadline - time.monotonic()) if deadline else None
                 try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
+                    _, stderr = process.communicate(timeout=remaining)
+                except subprocess.TimeoutExpired:
+                    kill_process_tree(process)
+                    process.communicate()
+                    return False, f"timed out after {self.timeout:g}s", None
+                
+                if process.returncode != 0:
+                    return False, stderr.strip() if stderr else "Unknown error", None
+            
+            return True, "", None
+        
+        finally:
+            # Clean up temp file
+            try:
+                os.unlink(tmp_path)
+            except:
+                pass
+    
+    def convert_diagram(self, mmd_file: Path, mermaid_cmd: str) -> bool:
+        """Convert a single Mermaid diagram to image."""
+        file_name = mmd_file.name
+        targets = self.output_targets(mmd_file.stem)
+        metrics = {'diagram': file_name, 'status': 'skipped', 'cache': 'existing',
+                   'attempts': 0, 'wall_seconds': 0.0, 'renderer_seconds': None,
+                   'startup_seconds': None}
+        
+        # Check if should skip
+        if self.skip_existing and all(t['output'].exists() for t in targets):
+            self._log(f"⏭️  Skipping {file_name} (already exists)")
+            self._record('skipped')
+            self._record_metrics(metrics, targets)
+            return True
+        
+        try:
+            # Read and clean content
+            with open(mmd_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            
+            cleaned_content = self.clean_mermaid_content(content)
+            metrics['source_bytes'] = len(cleaned_content.encode('utf-8'))
+            metrics['nodes'], metrics['edges'] = count_graph_elements(cleaned_content)
+            for target in targets:
+                target['cache_name'] = target['output'].relative_to(self.output_dir).as_posix()
+                target['cache_key'] = self.render_cache_key(cleaned_content, target)
+            
+            # Only outputs whose source or options changed since the last render
+            stale = [t for t in targets
+                     if self.force or not t['output'].exists()
+                     or self.render_cache.get(t['cache_name']) != t['cache_key']]
+            metrics['cache'] = ('hit' if not stale else
+                                'miss' if len(stale) == len(targets) else 'partial')
+            if not stale:
+                self._log(f"⏭️  Skipping {file_name} (unchanged)")
+                self._record('skipped')
+                self._record_metrics(metrics, targets)
+                return True
+            
+            self._log(f"ℹ️  Converting {file_name}...")
+            metrics['renderer'] = 'batch' if self.batch_renderer else 'subprocess'
+            # Render next to the outputs and move into place on success, so a
+            # failed re-render keeps the last good image (and os.replace never
+            # writes through a hard link still shared with a former duplicate)
+            rendering = [dict(t, output=rendering_path(t['output'])) for t in stale]
+            
+            attempts = interruptions = 0
+            started = time.perf_counter()
+            while True:
+                attempt_started = time.perf_counter()
+                try:
+                    success, error_msg, renderer_seconds = self._render_once(
+                        cleaned_content, rendering, mermaid_cmd)
+                except RendererInterrupted as e:
+                    # Killed for another diagram: not this diagram's fault, so it
+                    # does not use up an attempt, but has its own limit of retries
+                    interruptions += 1
+                    if interruptions > self.retries:
+                        success, renderer_seconds = False, None
+                        error_msg = f"renderer interrupted {interruptions} times: {e}"
+                        attempt_seconds = time.perf_counter() - attempt_started
+                        break
+                    self._log(f"↻  Retrying {file_name} "
+                              f"(interrupted {interruptions}/{self.retries}): {e}")
+                    continue
+                attempts += 1
+                attempt_seconds = time.perf_counter() - attempt_started
+                if success and not all(t['output'].exists() for t in rendering):
+                    success, error_msg = False, "renderer reported success but wrote no output"
+                
+                if (success or attempts > self.retries
+                        or PERMANENT_ERROR_PATTERN.search(error_msg or "")):
+                    break
+                
+                delay = self.retry_backoff * (2 ** (attempts - 1))
+                self._log(f"↻  Retrying {file_name} in {delay:g}s "
+                          f"(attempt {attempts + 1}/{self.retries + 1}): {error_msg[:80]}")
+                time.sleep(delay)
+            
+            metrics['attempts'] = attempts
+            if interruptions:
+                metrics['interruptions'] = interruptions
+            metrics['wall_seconds'] = round(time.perf_counter() - started, 4)
+            if renderer_seconds is not None:
+                # Time outside the browser: IPC, queueing behind other jobs, file I/O
+                metrics['renderer_seconds'] = round(renderer_seconds, 4)
+                metrics['startup_seconds'] = round(max(0.0, attempt_seconds - renderer_seconds), 4)
+            
+            if success and self.optimize:
+                self.optimize_outputs(rendering)
+            
+            if success:
+                for target, rendered in zip(stale, rendering):
+                    os.replace(rendered['output'], target['output'])
+                    if 'bytes_before_optimize' in rendered:
+                        target['bytes_before_optimize'] = rendered['bytes_before_optimize']
+                sizes = ", ".join(f"{t['output'].name} {t['output'].stat().st_size / 1024:.1f} KB"
+                                  for t in stale)
+                self._log(f"✅ ✓ {file_name} → {sizes}")
+                with self._lock:
+                    for target in stale:
+                        self.render_cache[target['cache_name']] = target['cache_key']
+                self._record('converted')
+                metrics['status'] = 'converted'
+                self._record_metrics(metrics, stale)
+                return True
+            else:
+                error_msg = error_msg or "Unknown error"
+                self._log(f"❌ Conversion failed ({file_name}): {error_msg[:100]}")
+                # Drop partial renders; the previous outputs (if any) stay, and
+                # their cache entries still point at the old source, so the
+                # next run retries this diagram
+                for target in rendering:
+                    try:
+                        target['output'].unlink()
+                    except OSError:
+                        pass
+                self._record_failure(mmd_file, stale, attempts, error_msg)
+                metrics['status'] = 'failed'
+                self._record_metrics(metrics, stale)
+                return False
                     
         except Exception as e:
-            print(f"❌ Error converting {file_name}: {e}")
-            self.total_failed += 1
+            self._log(f"❌ Error converting {file_name}: {e}")
+            self._record_failure(mmd_file, targets, 1, str(e))
+            metrics['status'] = 'failed'
+            self._record_metrics(metrics, targets)
             return False
     
+    def optimize_outputs(self, targets: List[Dict]):
+        """Shrink freshly rendered files; failures leave the original in place."""
+        for target in targets:
+            output = target['output']
+            try:
+                if target['format'] == 'png' and self.optimize_png:
+                    before, after = optimize_png(output, self.quantize_colors)
+                elif target['format'] == 'svg':
+                    before, after = minify_svg(output)
+                else:
+                    continue
+            except Exception as e:
+                self._log(f"⚠️  Could not optimize {output.name}: {e}")
+                continue
+            target['bytes_before_optimize'] = before
+            with self._lock:
+                self.bytes_saved += before - after
+    
+    def _record_metrics(self, metrics: Dict, targets: List[Dict]):
+        """Attach output sizes and keep the record for --metrics-out."""
+        if not self.metrics_out:
+            return
+        outputs = []
+        for target in targets:
+            output = target['output']
+            outputs.append({
+                'path': output.as_posix(),
+                'format': target['format'],
+                'scale': target['scale'],
+                'bytes': output.stat().st_size if output.exists() else None,
+            })
+            if 'bytes_before_optimize' in target:
+                outputs[-1]['bytes_before_optimize'] = target['bytes_before_optimize']
+        metrics['outputs'] = outputs
+        metrics['output_bytes'] = sum(o['bytes'] or 0 for o in outputs)
+        if any('bytes_before_optimize' in o for o in outputs):
+            metrics['optimize_saved_bytes'] = sum(
+                o['bytes_before_optimize'] - (o['bytes'] or 0)
+                for o in outputs if 'bytes_before_optimize' in o)
+        with self._lock:
+            self.metrics.append(metrics)
+    
+    def write_metrics(self, duration: float):
+        """
+        Write build metrics: NDJSON (.ndjson/.jsonl, appended, one run record
+        followed by one line per diagram) or a single JSON document otherwise.
+        """
+        if not self.metrics_out:
+            return
+        
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                    capture_output=True, text=True, check=False,
+                                    timeout=5).stdout.strip() or None
+        except (OSError, subprocess.TimeoutExpired):
+            commit = None
+        
+        run = {
+            'type': 'run',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'toolchain': self.toolchain_fingerprint(),
+            'mermaid_version': self.mermaid_version,
+            'renderer_startup_seconds': self.renderer_startup_seconds,
+            'jobs': self.jobs,
+            'formats': self.formats,
+            'duration_seconds': round(duration, 3),
+            'converted': self.total_converted,
+            'skipped': self.total_skipped,
+            'failed': self.total_failed,
+            'optimize_saved_bytes': self.bytes_saved if self.optimize else None,
+        }
+        diagrams = [dict(type='diagram', **m) for m in sorted(self.metrics, key=lambda m: m['diagram'])]
+        
+        self.metrics_out.parent.mkdir(parents=True, exist_ok=True)
+        if self.metrics_out.suffix in ('.ndjson', '.jsonl'):
+            with open(self.metrics_out, 'a', encoding='utf-8') as f:
+                for record in [run] + diagrams:
+                    f.write(json.dumps(record) + '\n')
+        else:
+            with open(self.metrics_out, 'w', encoding='utf-8') as f:
+                json.dump({'run': run, 'diagrams': diagrams}, f, indent=2)
+                f.write('\n')
+        print(f"ℹ️  Metrics written to {self.metrics_out}")
+    
+    def _render_once(self, cleaned_content: str, targets: List[Dict],
+                     mermaid_cmd: str) -> Tuple[bool, str, Optional[float]]:
+        """One render attempt with the wall-clock limit applied."""
+        renderer = self._live_batch_renderer()
+        if renderer:
+            return renderer.render(cleaned_content, targets, self.render_options(),
+                                   timeout=self.timeout)
+        return self._render_with_subprocess(cleaned_content, targets, mermaid_cmd)
+    
+    def _live_batch_renderer(self) -> Optional[MermaidBatchRenderer]:
+        """The shared renderer, restarted if a timeout or crash killed it."""
+        with self._renderer_lock:
+            renderer = self.batch_renderer
+            if renderer is None or renderer.is_alive():
+                return renderer
+            
+            self._log("⚠️  Persistent renderer stopped, restarting...")
+            renderer.kill()
+            replacement = MermaidBatchRenderer(renderer.cli_dir, self.memory_limit_mb)
+            if replacement.start():
+                self.batch_renderer = replacement
+            else:
+                self._log(f"⚠️  Restart failed ({replacement.error}), "
+                          "using one mmdc process per diagram")
+                self.batch_renderer = None
+            return self.batch_renderer
+    
+    def _record_failure(self, mmd_file: Path, targets: List[Dict], attempts: int, error: str):
+        """Count a failed diagram and keep its details for the failure report."""
+        with self._lock:
+            self.failures.append({
+                'diagram': mmd_file.name,
+                'source': str(mmd_file),
+                'outputs': [str(t['output']) for t in targets],
+                'attempts': attempts,
+                'timed_out': error.startswith("timed out"),
+                'error': error,
+            })
+        self._record('failed')
+    
+    def write_failure_report(self):
+        """Write failed diagrams as JSON for CI (an empty list on success)."""
+        if not self.failure_report:
+            return
+        report = {
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'timeout_seconds': self.timeout,
+            'max_attempts': self.retries + 1,
+            'failed': len(self.failures),
+            'failures': sorted(self.failures, key=lambda f: f['diagram']),
+        }
+        self.failure_report.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.failure_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"ℹ️  Failure report: {self.failure_report} ({len(self.failures)} failed)")
+    
+    def render_options(self) -> Dict:
+        """Options sent to the batch renderer for every diagram."""
+        return {
+            'theme': self.theme,
+            'background': self.background,
+            'width': self.width if self.width > 0 else 800,
+            'height': self.height if self.height > 0 else 600,
+        }
+    
+    def start_batch_renderer(self, mermaid_cmd: str):
+        """Start the persistent renderer, or stay on the per-file subprocess path."""
+        if not self.use_batch:
+            return
+        
+        cli_dir = self.toolchain.get('cli_dir')
+        if not cli_dir:
+            cli_dir = find_mermaid_cli_package(mermaid_cmd)
+            if cli_dir and self.toolchain:
+                self.toolchain['cli_dir'] = str(cli_dir)
+                self.save_toolchain()
+        if not cli_dir:
+            print("⚠️  Mermaid CLI package not located, using one mmdc process per diagram")
+            return
+        
+        print("ℹ️  Starting persistent renderer (one headless browser for all diagrams)...")
+        renderer = MermaidBatchRenderer(Path(cli_dir), self.memory_limit_mb)
+        started = time.perf_counter()
+        if renderer.start():
+            self.renderer_startup_seconds = round(time.perf_counter() - started, 4)
+            print(f"✅ Persistent renderer ready ({self.renderer_startup_seconds:.1f}s)")
+            self.batch_renderer = renderer
+        else:
+            print(f"⚠️  Persistent renderer unavailable ({renderer.error}), "
+                  "using one mmdc process per diagram")
+    
     def generate(self):
         """Generate all diagram images."""
         print()
@@ -215,29 +1287,191 @@ class DiagramImageGenerator:
         print(f"✅ Found {len(mmd_files)} diagram(s)")
         print()
         
-        # Create output directory
-        output_subdir = self.output_dir / self.format
-        output_subdir.mkdir(parents=True, exist_ok=True)
+        # Create output directories
+        output_subdirs = [self.output_dir / fmt for fmt in self.formats]
+        for output_subdir in output_subdirs:
+            output_subdir.mkdir(parents=True, exist_ok=True)
         
         # Convert each diagram
-        print(f"ℹ️  Converting diagrams to {self.format} format...")
-        print(f"ℹ️  Output directory: {output_subdir}")
+        print(f"ℹ️  Converting diagrams to {', '.join(self.formats)} format...")
+        if 'png' in self.formats and self.png_scales != [1.0]:
+            print(f"ℹ️  PNG scales: {', '.join(f'{s:g}x' for s in self.png_scales)}")
+        print(f"ℹ️  Output directory: {', '.join(str(d) for d in output_subdirs)}")
         print(f"ℹ️  Image size: {self.width}px width", end="")
         if self.height > 0:
             print(f" x {self.height}px height")
         else:
             print(" (auto height)")
         print(f"ℹ️  Theme: {self.theme} | Background: {self.background}")
+        jobs = min(self.jobs, len(mmd_files))
+        print(f"ℹ️  Parallel jobs: {jobs}")
         print()
         
-        import time
+        self.load_render_cache()
+        self.load_aliases()
+        
         start_time = time.time()
         
-        for mmd_file in mmd_files:
-            self.convert_diagram(mmd_file, mermaid_cmd)
+        self.start_batch_renderer(mermaid_cmd)
+        try:
+            self.convert_all(mmd_files, mermaid_cmd)
+            duration = time.time() - start_time
+            self.save_render_cache()
+            self.print_summary(output_subdirs, duration)
+            self.write_failure_report()
+            self.write_metrics(duration)
+            if self.validate_svg:
+                self.validate_svg_outputs()
+            
+            # Create index file
+            self.create_index(mmd_files)
+            
+            if self.watch:
+                # Keep the renderer (and its browser) alive between rebuilds
+                self.watch_diagrams(mermaid_cmd)
+                return 0
+        finally:
+            if self.batch_renderer:
+                self.batch_renderer.close()
+                self.batch_renderer = None
+        
+        return 0 if self.total_failed == 0 else 1
+    
+    def convert_all(self, mmd_files: List[Path], mermaid_cmd: str,
+                    changed: Optional[List[Path]] = None):
+        """
+        Convert diagrams on the worker pool (or inline for a single job).
+        
+        Diagrams with identical cleaned sources are rendered once; the other
+        copies are linked to the canonical outputs afterwards.
+        
+        Args:
+            mmd_files: Every diagram source (duplicates are detected across all of them)
+            mermaid_cmd: Mermaid CLI command for subprocess renders
+            changed: Only convert these sources and their duplicates (watch mode)
+        """
+        canonical_files, duplicates = self.group_duplicates(mmd_files)
+        if changed is None:
+            self.aliases = {}
+        else:
+            changed_stems = {f.stem for f in changed}
+            canonical_files = [f for f in canonical_files if f.stem in changed_stems]
+            duplicates = {alias: entry for alias, entry in duplicates.items()
+                          if alias.stem in changed_stems or entry[0].stem in changed_stems}
+            for stem, canonical in list(self.aliases.items()):
+                if stem in changed_stems or canonical in changed_stems:
+                    del self.aliases[stem]
+        
+        jobs = min(self.jobs, len(canonical_files))
+        if jobs > 1:
+            # Conversions block on a subprocess or on the shared renderer,
+            # so threads are enough to keep several renders in flight
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(lambda f: self.convert_diagram(f, mermaid_cmd),
+                                        canonical_files))
+        else:
+            results = [self.convert_diagram(mmd_file, mermaid_cmd)
+                       for mmd_file in canonical_files]
+        
+        # Canonicals outside this pass (watch mode) kept their earlier outputs
+        rendered = dict(zip(canonical_files, results))
+        for alias_file, (canonical_file, cleaned_content) in duplicates.items():
+            self.alias_diagram(alias_file, canonical_file, cleaned_content,
+                               rendered.get(canonical_file, True))
+        self.save_aliases()
+    
+    def group_duplicates(self, mmd_files: List[Path]) -> Tuple[List[Path], Dict[Path, Tuple[Path, str]]]:
+        """
+        Group diagrams by the hash of their cleaned Mermaid source.
+        
+        Args:
+            mmd_files: Diagram sources to convert
+            
+        Returns:
+            (canonical files to render, {duplicate file: (canonical file, cleaned source)})
+        """
+        canonical_by_hash: Dict[str, Path] = {}
+        canonical_files = []
+        duplicates = {}
+        for mmd_file in sorted(mmd_files):
+            try:
+                with open(mmd_file, 'r', encoding='utf-8') as f:
+                    cleaned_content = self.clean_mermaid_content(f.read())
+            except (OSError, UnicodeDecodeError):
+                # Let convert_diagram report the read error
+                canonical_files.append(mmd_file)
+                continue
+            digest = hashlib.sha256(cleaned_content.encode('utf-8')).hexdigest()
+            if digest in canonical_by_hash:
+                duplicates[mmd_file] = (canonical_by_hash[digest], cleaned_content)
+            else:
+                canonical_by_hash[digest] = mmd_file
+                canonical_files.append(mmd_file)
+        return canonical_files, duplicates
+    
+    def alias_diagram(self, alias_file: Path, canonical_file: Path,
+                      cleaned_content: str, canonical_ok: bool):
+        """Point a duplicate diagram's outputs at the canonical diagram's images."""
+        file_name = alias_file.name
+        targets = self.output_targets(alias_file.stem)
+        canonical_targets = self.output_targets(canonical_file.stem)
+        metrics = {'diagram': file_name, 'status': 'aliased', 'cache': 'alias',
+                   'canonical': canonical_file.name, 'attempts': 0, 'wall_seconds': 0.0,
+                   'renderer_seconds': None, 'startup_seconds': None}
+        
+        if not canonical_ok or not all(t['output'].exists() for t in canonical_targets):
+            error_msg = f"canonical diagram {canonical_file.name} was not rendered"
+            self._log(f"❌ Cannot alias {file_name}: {error_msg}")
+            self._record_failure(alias_file, targets, 0, error_msg)
+            metrics['status'] = 'failed'
+            self._record_metrics(metrics, targets)
+            return
+        
+        try:
+            for target, source in zip(targets, canonical_targets):
+                link_output(source['output'], target['output'])
+                # Same source and options, so the canonical cache key applies too
+                target['cache_name'] = target['output'].relative_to(self.output_dir).as_posix()
+                with self._lock:
+                    self.render_cache[target['cache_name']] = self.render_cache_key(
+                        cleaned_content, target)
+        except OSError as e:
+            self._log(f"❌ Cannot alias {file_name}: {e}")
+            self._record_failure(alias_file, targets, 0, str(e))
+            metrics['status'] = 'failed'
+            self._record_metrics(metrics, targets)
+            return
         
-        duration = time.time() - start_time
+        with self._lock:
+            self.aliases[alias_file.stem] = canonical_file.stem
+        self._log(f"🔗 {file_name} → same diagram as {canonical_file.name}")
+        self._record('aliased')
+        self._record_metrics(metrics, targets)
+    
+    def validate_svg_outputs(self):
+        """Trial-render the SVG outputs and cache verdicts for the PDF builders."""
+        if 'svg' not in self.formats:
+            print("⚠️  --validate-svg needs SVG output (--format svg,...), skipping")
+            return
+        try:
+            from svg_helper import validate_svg_directory, check_dependencies
+        except ImportError as e:
+            print(f"⚠️  Cannot validate SVGs ({e}); install reportlab svglib")
+            return
+        if not check_dependencies():
+            print("⚠️  Cannot validate SVGs: svglib not installed (pip install svglib)")
+            return
         
+        print("ℹ️  Validating SVGs for PDF embedding...")
+        results = validate_svg_directory(self.output_dir / "svg")
+        failed = {name: r for name, r in results.items() if not r['ok']}
+        for name, result in failed.items():
+            print(f"⚠️  {name} cannot be drawn by svglib ({result['error'][:80]}); "
+                  f"PDFs will use the PNG or a placeholder")
+        print(f"✅ {len(results) - len(failed)}/{len(results)} SVGs render cleanly in PDFs")
+    
+    def print_summary(self, output_subdirs: List[Path], duration: float):
+        """Print conversion statistics for a full run."""        
         # Print summary
         print()
         print("=" * 45)
@@ -247,24 +1481,86 @@ class DiagramImageGenerator:
         print("Statistics:")
         print(f"  ✅ Converted:  {self.total_converted}")
         print(f"  ⏭️  Skipped:    {self.total_skipped}")
+        if self.total_aliased:
+            print(f"  🔗 Aliased:    {self.total_aliased}")
         print(f"  ❌ Failed:     {self.total_failed}")
         print(f"  ⏱️  Duration:   {duration:.1f} seconds")
         print()
         
         if self.total_converted > 0:
-            print(f"Output: {output_subdir}")
+            print(f"Output: {', '.join(str(d) for d in output_subdirs)}")
             
             # Calculate total size
-            total_size = sum(f.stat().st_size for f in output_subdir.glob(f"*.{self.format}"))
+            total_size = sum(f.stat().st_size
+                             for fmt, output_subdir in zip(self.formats, output_subdirs)
+                             for f in output_subdir.glob(f"*.{fmt}"))
             total_size_mb = total_size / (1024 * 1024)
             print(f"Total size: {total_size_mb:.2f} MB")
+            if self.optimize:
+                print(f"Optimization saved: {self.bytes_saved / 1024:.1f} KB")
         
         print()
+    
+    def _snapshot_sources(self) -> Dict[Path, Tuple[int, int]]:
+        """Map each .mmd file to (mtime_ns, size) for change detection."""
+        snapshot = {}
+        for mmd_file in self.diagrams_dir.glob("*.mmd"):
+            try:
+                stat = mmd_file.stat()
+            except OSError:
+                continue  # Deleted between glob and stat
+            snapshot[mmd_file] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+    
+    def watch_diagrams(self, mermaid_cmd: str):
+        """Poll the diagrams directory and re-render only changed sources until Ctrl+C."""
+        print(f"👀 Watching {self.diagrams_dir}/*.mmd for changes (Ctrl+C to stop)...")
+        snapshot = self._snapshot_sources()
         
-        # Create index file
-        self.create_index(mmd_files)
-        
-        return 0 if self.total_failed == 0 else 1
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                current = self._snapshot_sources()
+                if current == snapshot:
+                    continue
+                
+                # Debounce: editors often write a file several times in a row
+                while True:
+                    time.sleep(self.debounce)
+                    latest = self._snapshot_sources()
+                    if latest == current:
+                        break
+                    current = latest
+                
+                changed = sorted(f for f, sig in current.items() if snapshot.get(f) != sig)
+                files_changed = current.keys() != snapshot.keys()
+                snapshot = current
+                
+                if changed:
+                    print()
+                    print(f"🔄 {len(changed)} diagram(s) changed: "
+                          f"{', '.join(f.name for f in changed)}")
+                    self.total_converted = self.total_skipped = self.total_failed = 0
+                    self.total_aliased = 0
+                    self.failures = []
+                    self.metrics = []
+                    start_time = time.time()
+                    self.convert_all(sorted(current), mermaid_cmd, changed=changed)
+                    self.save_render_cache()
+                    self.write_failure_report()
+                    self.write_metrics(time.time() - start_time)
+                    if self.validate_svg:
+                        self.validate_svg_outputs()
+                    print(f"✅ Rebuilt in {time.time() - start_time:.1f}s "
+                          f"({self.total_converted} converted, {self.total_skipped} unchanged, "
+                          f"{self.total_aliased} aliased, {self.total_failed} failed)")
+                
+                if files_changed:
+                    # Diagrams added or removed: refresh the index table
+                    self.create_index(sorted(current))
+        except KeyboardInterrupt:
+            print()
+            print("👋 Stopped watching")
     
     def create_index(self, mmd_files):
         """Create README index for generated images."""
@@ -277,7 +1573,7 @@ class DiagramImageGenerator:
         content = f"""# Diagram Images
 
 **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}  
-**Format:** {self.format}  
+**Format:** {", ".join(self.formats)}  
 **Source:** {self.diagrams_dir}  
 **Total Diagrams:** {self.total_converted}
 
@@ -300,6 +1596,12 @@ class DiagramImageGenerator:
             name = mmd_file.stem
             title = name.replace('-', ' ').replace('_', ' ').title()
             
+            # Duplicates link to the canonical image so every page shares one file
+            canonical = self.aliases.get(name)
+            if canonical:
+                title += f" (same as `{canonical}`)"
+                name = canonical
+            
             svg_path = f"svg/{name}.svg"
             png_path = f"png/{name}.png"
             source_path = f"../{mmd_file.name}"
@@ -314,6 +1616,9 @@ class DiagramImageGenerator:
         
         content += """
 
+Diagrams marked *same as* have the same Mermaid source as another diagram;
+they are rendered once and listed in `aliases.json`.
+
 ---
 
 ## Usage
@@ -354,8 +1659,35 @@ python scripts/generate_diagram_images.py
 # Generate PNG (high-res)
 python scripts/generate_diagram_images.py --format png --width 2400
 
+# SVG and PNG (1x + 2x) from a single render of each diagram
+python scripts/generate_diagram_images.py --format svg,png --png-scale 1,2
+
 # Skip existing files
 python scripts/generate_diagram_images.py --skip-existing
+
+# Ignore the render cache and re-render everything
+python scripts/generate_diagram_images.py --force
+
+# One mmdc process per diagram instead of a shared browser session
+python scripts/generate_diagram_images.py --no-batch
+
+# Keep running and re-render diagrams as their .mmd files change
+python scripts/generate_diagram_images.py --watch
+
+# Bound each diagram to 60s, retry twice, write failures as JSON
+python scripts/generate_diagram_images.py --timeout 60 --retries 2 --failure-report failures.json
+
+# Per-diagram timing/size metrics (NDJSON is appended, JSON is overwritten)
+python scripts/generate_diagram_images.py --metrics-out build/diagram-metrics.ndjson
+
+# Recompress PNGs / minify SVGs (add --quantize 256 for palette PNGs)
+python scripts/generate_diagram_images.py --format svg,png --optimize
+
+# Check that every SVG can be drawn in the PDF builds (needs svglib)
+python scripts/generate_diagram_images.py --format svg,png --validate-svg
+
+# Limit parallel rendering (default: one job per CPU core)
+python scripts/generate_diagram_images.py --jobs 2
 ```
 
 ---
@@ -369,6 +1701,28 @@ python scripts/generate_diagram_images.py --skip-existing
         print(f"✅ Index file created: {index_file}")
 
 
+def parse_formats(value: str) -> str:
+    """argparse type for --format: comma-separated list of supported formats."""
+    formats = [f.strip().lower() for f in value.split(',') if f.strip()]
+    invalid = [f for f in formats if f not in SUPPORTED_FORMATS]
+    if not formats or invalid:
+        raise argparse.ArgumentTypeError(
+            f"invalid format(s) {', '.join(invalid) or value!r}; "
+            f"choose from {', '.join(SUPPORTED_FORMATS)}")
+    return ",".join(dict.fromkeys(formats))
+
+
+def parse_scales(value: str) -> List[float]:
+    """argparse type for --png-scale: comma-separated positive numbers."""
+    try:
+        scales = [float(s) for s in value.split(',') if s.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid scale list: {value!r}")
+    if not scales or any(s <= 0 for s in scales):
+        raise argparse.ArgumentTypeError(f"scales must be positive: {value!r}")
+    return list(dict.fromkeys(scales))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Generate SVG/PNG images from Mermaid diagrams'
@@ -386,9 +1740,15 @@ def main():
     )
     parser.add_argument(
         '--format',
-        choices=['svg', 'png', 'pdf'],
+        type=parse_formats,
         default='svg',
-        help='Output format (default: svg)'
+        help='Output format(s), comma-separated: svg, png, pdf (default: svg)'
+    )
+    parser.add_argument(
+        '--png-scale',
+        type=parse_scales,
+        default=[1.0],
+        help='PNG scale factor(s), comma-separated, e.g. 1,2 (default: 1)'
     )
     parser.add_argument(
         '--width',
@@ -417,6 +1777,79 @@ def main():
         action='store_true',
         help='Skip files that already exist'
     )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Re-render every diagram, ignoring the render cache'
+    )
+    parser.add_argument(
+        '--no-batch',
+        action='store_true',
+        help='Launch one mmdc process per diagram instead of a shared browser session'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and re-render diagrams whose .mmd files change'
+    )
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=0.5,
+        help='Seconds to wait for edits to settle before re-rendering in --watch mode (default: 0.5)'
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=120,
+        help='Wall-clock limit per diagram attempt in seconds, 0=none (default: 120)'
+    )
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=2,
+        help='Retries for timed-out or crashed renders, with exponential backoff (default: 2)'
+    )
+    parser.add_argument(
+        '--memory-limit',
+        type=int,
+        default=0,
+        metavar='MB',
+        help='Node.js heap limit for renderer processes in MB, 0=unlimited (default: 0)'
+    )
+    parser.add_argument(
+        '--failure-report',
+        metavar='PATH',
+        help='Write a JSON report of failed diagrams to PATH'
+    )
+    parser.add_argument(
+        '--metrics-out',
+        metavar='PATH',
+        help='Write per-diagram render metrics to PATH (.ndjson/.jsonl appends, else JSON)'
+    )
+    parser.add_argument(
+        '--optimize',
+        action='store_true',
+        help='Losslessly recompress PNGs, strip metadata and minify SVGs (requires Pillow for PNG)'
+    )
+    parser.add_argument(
+        '--quantize',
+        type=int,
+        default=0,
+        metavar='COLORS',
+        help='Quantize PNGs to a palette of at most COLORS colors (lossy, implies --optimize)'
+    )
+    parser.add_argument(
+        '--validate-svg',
+        action='store_true',
+        help='Trial-render generated SVGs with svglib and cache the verdicts for the PDF builders'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=0,
+        help='Number of diagrams to render in parallel, 0=CPU cores (default: 0)'
+    )
     
     args = parser.parse_args()
     
@@ -424,11 +1857,25 @@ def main():
         diagrams_dir=args.diagrams_dir,
         output_dir=args.output_dir,
         format=args.format,
+        png_scales=args.png_scale,
         width=args.width,
         height=args.height,
         background=args.background,
         theme=args.theme,
-        skip_existing=args.skip_existing
+        skip_existing=args.skip_existing,
+        jobs=args.jobs,
+        force=args.force,
+        use_batch=not args.no_batch,
+        watch=args.watch,
+        debounce=args.debounce,
+        timeout=args.timeout,
+        retries=args.retries,
+        memory_limit_mb=args.memory_limit,
+        failure_report=args.failure_report,
+        metrics_out=args.metrics_out,
+        optimize=args.optimize,
+        quantize_colors=args.quantize,
+        validate_svg=args.validate_svg
     )
     
     sys.exit(generator.generate())
@@ -24,6 +24,14 @@ from reportlab.pdfgen import canvas
 import markdown
 import argparse
 
+# Embed the logo once however many pages draw it (optional)
+try:
+    from svg_helper import shared_image, shared_image_path, save_image_metadata
+except ImportError:
+    shared_image = Image
+    shared_image_path = str
+    save_image_metadata = lambda: None
+
 # SOLID.AI Brand Colors
 BRAND_COLORS = {
     'primary_blue_dark': colors.HexColor('#2B5797'),
@@ -53,7 +61,7 @@ class SOLIDAIDocTemplate(SimpleDocTemplate):
             # Header logo (small)
             if os.path.exists(self.logo_path):
                 self.canv.drawImage(
-                    self.logo_path,
+                    shared_image_path(self.logo_path),
                     1*cm, self.height - 1.5*cm,
                     width=2*cm, height=2*cm,
                     preserveAspectRatio=True,
@@ -168,7 +176,7 @@ def create_cover_page(title, subtitle, version="1.0", date=None, logo_path='asse
     
     # Logo (centered, large)
     if os.path.exists(logo_path):
-        logo = Image(logo_path, width=10*cm, height=10*cm)
+        logo = shared_image(logo_path, width=10*cm, height=10*cm)
         logo.hAlign = 'CENTER'
         elements.append(logo)
         elements.append(Spacer(1, 2*cm))
@@ -278,6 +286,7 @@ def generate_pdf(input_file, output_file, logo_path='assets/images/solid-ai-logo
     
     # Generate PDF
     doc.build(elements)
+    save_image_metadata()
     print(f"✅ PDF generated: {output_file}")
 
 
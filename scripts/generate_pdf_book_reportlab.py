@@ -14,18 +14,31 @@ Options:
     --include-adoption     Include adoption pack materials
     --page-size SIZE       Page size: A4, Letter (default: A4)
     --color-scheme SCHEME  Scheme: color, grayscale (default: color)
+    --max-dpi DPI          Downsample diagrams: screen (150), print (300) or a number
+    --vector-diagrams      Embed SVG diagrams as vector form XObjects when available
+    --jobs N, -j N         Parse chapters in N processes, 0 = CPU cores (default: 1)
+    --no-cache             Re-parse/re-render everything instead of reusing .cache
+    --sharded              Lay out chapters as separate PDFs in --jobs processes and
+                           merge them, reusing unchanged shards (requires pdfrw)
 
 Requirements:
-    pip install reportlab markdown2 pygments
+    pip install reportlab markdown2 pygments pdfrw  # pdfrw for --sharded
 """
 
 import os
+import io
 import sys
+import json
+import time
+import hashlib
+import pickle
 from pathlib import Path
 from datetime import datetime
 import argparse
 import re
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from typing import List, Dict, Optional, Set, Tuple
 
 try:
     from reportlab.lib import colors
@@ -38,6 +51,7 @@ try:
     )
     from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
     from reportlab.pdfgen import canvas
+    from reportlab import Version as REPORTLAB_VERSION
     import markdown2
 except ImportError as e:
     print(f"❌ ERROR: Missing dependency - {e}")
@@ -47,12 +61,260 @@ except ImportError as e:
 
 # Import SVG helper (optional dependency)
 try:
-    from svg_helper import create_diagram_flowable, check_dependencies
+    from svg_helper import (
+        create_diagram_flowable, check_dependencies, get_diagram_image_index,
+        save_image_metadata, resolve_max_dpi, find_diagram_references,
+        prepare_diagram_flowables
+    )
     SVG_SUPPORT = check_dependencies()
 except ImportError:
     SVG_SUPPORT = False
     print("ℹ️  Info: SVG support not available (install svglib for diagram embedding)")
 
+from latex_cleaner import clean_latex_artifacts
+from markdown_blocks import tokenize_blocks
+
+# Shard merging (optional dependency, imported on use)
+PDFRW_AVAILABLE = find_spec('pdfrw') is not None
+
+TABLE_SEPARATOR_PATTERN = re.compile(r'^\s*\|[\s\-:|]+\|\s*$')
+LINK_PATTERN = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+ITALIC_PATTERN = re.compile(r'\*(.+?)\*')
+INLINE_CODE_PATTERN = re.compile(r'`(.+?)`')
+
+# Bump when parsing, flowables or page layout change, to invalidate cached
+# chapter IRs and shards
+PARSER_VERSION = 1
+# Relative to the repository root
+CHAPTER_CACHE_DIR = Path(".cache") / "chapters"
+SHARD_CACHE_DIR = Path(".cache") / "shards"
+
+# Content parts whose flowables start / end with a PageBreak. Shards are cut
+# before every part that starts on a new page.
+SHARD_START_PARTS = ('chapter', 'section_divider')
+PAGE_BREAK_END_PARTS = ('cover', 'toc', 'section_divider')
+
+
+def format_inline_markdown(text: str) -> str:
+    """Format inline markdown (bold, italic, code, links) as ReportLab markup."""
+    # Clean LaTeX artifacts first
+    text = clean_latex_artifacts(text)
+    
+    # Links [text](url) - style as colored underlined text
+    text = LINK_PATTERN.sub(r'<font color="#06b6d4"><u>\1</u></font>', text)
+    
+    # Bold **text**
+    text = BOLD_PATTERN.sub(r'<b>\1</b>', text)
+    
+    # Italic *text*
+    text = ITALIC_PATTERN.sub(r'<i>\1</i>', text)
+    
+    # Inline code `text`
+    text = INLINE_CODE_PATTERN.sub(r'<font name="Courier" color="#8b5cf6">\1</font>', text)
+    
+    return text
+
+
+def table_rows(table_lines: List[str]) -> List[List[str]]:
+    """Cell markup of each markdown table row (separator rows skipped)."""
+    rows = []
+    for line in table_lines:
+        # Skip separator lines (|---|---|)
+        if TABLE_SEPARATOR_PATTERN.match(line):
+            continue
+        
+        # Split by | and clean up
+        cells = [cell.strip() for cell in line.split('|')]
+        # Remove empty first/last elements from leading/trailing |
+        if cells and not cells[0]:
+            cells = cells[1:]
+        if cells and not cells[-1]:
+            cells = cells[:-1]
+        
+        if cells:
+            rows.append([format_inline_markdown(cell) for cell in cells])
+    return rows
+
+
+def parse_chapter(content: str) -> List[Dict]:
+    """
+    Parse chapter markdown into its intermediate representation.
+    
+    The IR is the block token stream of markdown_blocks.tokenize_blocks with
+    the inline markup of every block already rendered (paragraph/blockquote/
+    callout 'markup', list item 'markup', table 'rows', cleaned code 'code').
+    It holds only plain data, so it can be built in another process.
+    
+    Args:
+        content: Chapter markdown
+        
+    Returns:
+        Block list, in document order
+    """
+    blocks = tokenize_blocks(content)
+    for block in blocks:
+        block_type = block['type']
+        if block_type == 'paragraph':
+            block['markup'] = format_inline_markdown(block['text'])
+        elif block_type == 'list':
+            for item in block['items']:
+                item['markup'] = format_inline_markdown(item['content'])
+        elif block_type == 'table':
+            block['rows'] = table_rows(block['lines'])
+        elif block_type == 'code':
+            # Clean LaTeX artifacts from code blocks
+            block['code'] = clean_latex_artifacts(block['text'])
+        elif block_type == 'blockquote':
+            block['markup'] = format_inline_markdown(' '.join(block['lines']))
+        elif block_type == 'callout':
+            block['markup'] = '<br/>'.join(format_inline_markdown(line.strip())
+                                           for line in block['lines'])
+    return blocks
+
+
+def prune_cache_dir(cache_dir: Path, keys: Set[str]) -> int:
+    """
+    Delete cache entries that no current build input maps to.
+    
+    Entries are named <key>.<ext> (leftover <key>.<ext>.<pid>.tmp files
+    from interrupted builds go too).
+    
+    Args:
+        cache_dir: Cache directory (may not exist yet)
+        keys: Keys of the current build
+        
+    Returns:
+        Number of files deleted
+    """
+    removed = 0
+    if not cache_dir.is_dir():
+        return removed
+    for cache_file in cache_dir.iterdir():
+        if cache_file.is_file() and cache_file.name.split('.', 1)[0] not in keys:
+            try:
+                cache_file.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def split_shards(parts: List[Dict[str, str]]) -> List[Dict]:
+    """
+    Group content parts into shards that can be laid out as separate PDFs.
+    
+    A shard starts at every part that begins with a page break, so shards
+    never share a page. Each shard drops its leading PageBreak unless the
+    previous shard ended with one: ReportLab keeps the empty page between
+    two consecutive breaks but drops an empty last page.
+    
+    Args:
+        parts: Content parts (see PDFBookGenerator._collect_content)
+        
+    Returns:
+        List of shard dicts: parts, keep_leading_break
+    """
+    shards = []
+    for part in parts:
+        if not shards or part['type'] in SHARD_START_PARTS:
+            keep_leading_break = bool(shards) and shards[-1]['parts'][-1]['type'] in PAGE_BREAK_END_PARTS
+            shards.append({'parts': [], 'keep_leading_break': keep_leading_break})
+        shards[-1]['parts'].append(part)
+    return shards
+
+
+def _pdf_object_key(obj, memo: Dict[int, object]):
+    """Hashable description of a pdfrw object (streams by content hash)."""
+    cached = memo.get(id(obj))
+    if cached is not None:
+        return cached
+    from pdfrw import PdfDict, PdfArray
+    if isinstance(obj, PdfDict):
+        # /Length follows the stream; /Name is the (obsolete) per-shard resource name
+        items = tuple(sorted((key, _pdf_object_key(value, memo)) for key, value in obj.items()
+                             if key not in ('/Length', '/Name')))
+        stream = obj.stream
+        if stream is not None:
+            stream = hashlib.sha256(stream.encode('latin-1')).hexdigest()
+        key = ('dict', items, stream)
+    elif isinstance(obj, PdfArray):
+        key = ('array', tuple(_pdf_object_key(value, memo) for value in obj))
+    else:
+        key = ('value', str(obj))
+    memo[id(obj)] = key
+    return key
+
+
+def dedupe_page_resources(pages: List) -> int:
+    """
+    Make pages share identical fonts and images (XObjects) in place.
+    
+    Every shard PDF embeds its own copy of the fonts and images it uses;
+    after this, pdfrw writes each distinct one once.
+    
+    Args:
+        pages: pdfrw pages, possibly read from several PDFs
+        
+    Returns:
+        Number of duplicate objects replaced
+    """
+    canonical = {}
+    memo = {}
+    replaced = 0
+    for page in pages:
+        resources = page.Resources
+        if resources is None:
+            continue
+        for category in (resources.Font, resources.XObject):
+            if category is None:
+                continue
+            for name, obj in list(category.items()):
+                shared = canonical.setdefault(_pdf_object_key(obj, memo), obj)
+                if shared is not obj:
+                    category[name] = shared
+                    replaced += 1
+                if shared.Type == '/Font':
+                    shared.Name = None
+    return replaced
+
+
+class BookDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that bookmarks every ChapterTitle paragraph in the PDF outline."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bookmarks: List[Tuple[str, int]] = []  # (title, 0-based page index)
+    
+    def afterFlowable(self, flowable):
+        """Add an outline entry for chapter, section and contents titles."""
+        if isinstance(flowable, Paragraph) and flowable.style.name == 'ChapterTitle':
+            title = flowable.getPlainText()
+            key = f"bookmark-{len(self.bookmarks)}"
+            self.canv.bookmarkPage(key)
+            self.canv.addOutlineEntry(title, key, level=0)
+            self.bookmarks.append((title, self.page - 1))
+
+
+# Per-process book generator used by --jobs workers (see _init_book_worker)
+_book_worker = None
+
+
+def _init_book_worker(options: Dict):
+    """Process pool initializer: build the styles once per worker."""
+    global _book_worker
+    _book_worker = PDFBookGenerator(**options)
+
+
+def _parse_chapter_in_worker(content: str) -> Dict:
+    """Process pool task: chapter IR plus its pre-parsed paragraphs."""
+    return _book_worker._parse_chapter_ir(content)
+
+
+def _render_shard_in_worker(shard: Dict) -> Dict:
+    """Process pool task: lay out one shard PDF."""
+    return _book_worker._render_shard(shard)
+
 
 class PDFBookGenerator:
     """Generate SOLID.AI framework PDF book using ReportLab (cross-platform)."""
@@ -61,13 +323,30 @@ class PDFBookGenerator:
                  include_playbooks: bool = False,
                  include_adoption: bool = False,
                  page_size: str = "A4",
-                 color_scheme: str = "color"):
+                 color_scheme: str = "color",
+                 max_dpi: Optional[str] = None,
+                 vector_diagrams: bool = False,
+                 jobs: int = 1,
+                 use_cache: bool = True,
+                 sharded: bool = False):
         self.output_path = Path(output_path)
         self.include_playbooks = include_playbooks
         self.include_adoption = include_adoption
         self.page_size = A4 if page_size == "A4" else letter
+        self.page_size_name = "A4" if page_size == "A4" else "Letter"
         self.color_scheme = color_scheme
+        self.max_dpi = max_dpi  # None = embed diagram PNGs at full resolution
+        self.vector_diagrams = vector_diagrams  # Prefer SVG over PNG diagrams
+        self.diagram_batch = None  # Diagrams prepared in the background (see _build_story)
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)  # Chapter parsing / shard rendering processes
+        self.parsed_paragraphs: Dict[Tuple, List] = {}  # Paragraphs parsed by a worker, by markup/font
+        self.paragraph_log: Optional[List] = None  # Records parsed paragraphs (workers, cache misses)
+        self.use_cache = use_cache  # Reuse chapter IRs and shards from .cache
+        self.sharded = sharded  # Lay out chapters in shards and merge them (see _generate_sharded)
+        self.chapter_cache_stats = {'reused': 0, 'parsed': 0}
         self.root_dir = Path(__file__).parent.parent
+        self.chapter_cache_dir = self.root_dir / CHAPTER_CACHE_DIR
+        self.shard_cache_dir = self.root_dir / SHARD_CACHE_DIR
         self.docs_dir = self.root_dir / "DOCS"
         self.diagrams_dir = self.root_dir / "DIAGRAMS"
         self.playbooks_dir = self.root_dir / "PLAYBOOKS"
@@ -186,8 +465,16 @@ class PDFBookGenerator:
         print("🚀 SOLID.AI PDF Book Generator (ReportLab)")
         print("=" * 60)
         print(f"Output: {self.output_path}")
-        print(f"Page Size: {'A4' if self.page_size == A4 else 'Letter'}")
+        print(f"Page Size: {self.page_size_name}")
         print(f"Color Scheme: {self.color_scheme}")
+        if self.max_dpi:
+            print(f"Max Diagram DPI: {self.max_dpi}")
+        if self.jobs > 1:
+            print(f"{'Rendering' if self.sharded else 'Parsing'} Jobs: {self.jobs}")
+        if self.sharded:
+            print("Sharded: yes")
+        if not self.use_cache:
+            print("Chapter Cache: disabled")
         print(f"Include Playbooks: {self.include_playbooks}")
         print(f"Include Adoption: {self.include_adoption}")
         print()
@@ -197,15 +484,32 @@ class PDFBookGenerator:
         content_parts = self._collect_content()
         print(f"   ✓ Collected {len(content_parts)} sections")
         
-        # Step 2: Convert to ReportLab flowables
-        print("📝 Step 2/4: Converting to PDF elements...")
-        story = self._build_story(content_parts)
-        print(f"   ✓ Generated {len(story)} PDF elements")
-        
-        # Step 3: Generate PDF
-        print("📄 Step 3/4: Generating PDF...")
-        self._generate_pdf(story)
+        if self.sharded:
+            # Steps 2-3: Lay out shards in parallel, then merge them
+            self._generate_sharded(content_parts)
+        else:
+            # Step 2: Convert to ReportLab flowables
+            print("📝 Step 2/4: Converting to PDF elements...")
+            story = self._build_story(content_parts)
+            print(f"   ✓ Generated {len(story)} PDF elements")
+            if self.use_cache:
+                print(f"   ✓ Chapter cache: {self.chapter_cache_stats['reused']} reused, "
+                      f"{self.chapter_cache_stats['parsed']} parsed")
+            if SVG_SUPPORT:
+                self._print_image_report()
+                save_image_metadata()
+            
+            # Step 3: Generate PDF
+            print("📄 Step 3/4: Generating PDF...")
+            self._generate_pdf(story)
         print(f"   ✓ PDF saved to {self.output_path}")
+        if self.use_cache:
+            # Drop IRs of edited/removed chapters and of older parser versions
+            keys = {self._chapter_cache_key(part['content'])
+                    for part in content_parts if part['type'] == 'chapter'}
+            removed = prune_cache_dir(self.chapter_cache_dir, keys)
+            if removed:
+                print(f"   ✓ Pruned {removed} stale chapter cache entries")
         
         # Step 4: Display summary
         print("✨ Step 4/4: Finalizing...")
@@ -218,6 +522,18 @@ class PDFBookGenerator:
         print(f"📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 60)
         
+    def _print_image_report(self):
+        """Report diagram images that are referenced but missing, or never used."""
+        report = get_diagram_image_index(self.diagrams_dir).report()
+        print(f"   ✓ Diagrams: {len(report['referenced'])} referenced, "
+              f"{len(report['missing'])} missing, {len(report['unused'])} unused "
+              f"of {report['indexed']} images")
+        if report['missing']:
+            print(f"   ⚠️  Missing images: {', '.join(report['missing'])}")
+        if report['unused']:
+            print(f"   ℹ️  Unused images ({report['unused_bytes'] / 1024:.0f} KB): "
+                  f"{', '.join(report['unused'])}")
+    
     def _collect_content(self) -> List[Dict[str, str]]:
         """Collect all markdown content in order."""
         parts = []
@@ -482,24 +798,117 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         
         return parts
     
-    def _build_story(self, parts: List[Dict[str, str]]) -> List:
-        """Build ReportLab story from content parts."""
+    def _build_story(self, parts: List[Dict[str, str]],
+                     toc_parts: Optional[List[Dict[str, str]]] = None) -> List:
+        """
+        Build ReportLab story from content parts.
+        
+        Args:
+            parts: Content parts (see _collect_content)
+            toc_parts: Parts listed in the table of contents (default: parts)
+            
+        Returns:
+            Flowables
+        """
         story = []
         
-        for part in parts:
-            if part['type'] == 'cover':
-                story.extend(self._create_cover(part))
-            elif part['type'] == 'toc':
-                story.extend(self._create_toc(parts))
-            elif part['type'] == 'section_divider':
-                story.extend(self._create_section_divider(part))
-            elif part['type'] == 'subsection_header':
-                story.extend(self._create_subsection_header(part))
-            elif part['type'] == 'chapter':
-                story.extend(self._create_chapter(part))
+        # Unchanged chapters come from the IR cache; the rest are parsed below
+        chapters = [part['content'] for part in parts if part['type'] == 'chapter']
+        keys = [self._chapter_cache_key(content) if self.use_cache else None
+                for content in chapters]
+        cached_irs = [self._load_chapter_ir(key) if key else None for key in keys]
+        misses = [content for content, ir in zip(chapters, cached_irs) if ir is None]
+        chapter_irs = iter(zip(keys, cached_irs))
+        self.chapter_cache_stats = {'reused': len(chapters) - len(misses), 'parsed': len(misses)}
+        
+        # Parse missing chapters in worker processes; IRs come back in book order.
+        # Started before the diagram threads so workers are not forked mid-work.
+        parsed_irs = None
+        pool = None
+        if self.jobs > 1 and len(misses) > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=min(self.jobs, len(misses)),
+                initializer=_init_book_worker,
+                initargs=(self._worker_options(),)
+            )
+            parsed_irs = pool.map(_parse_chapter_in_worker, misses)
+        
+        # Prepare every diagram up front so image work overlaps markdown parsing
+        if SVG_SUPPORT:
+            references = [ref for part in parts if part['type'] == 'chapter'
+                          for ref in find_diagram_references(part['content'])]
+            self.diagram_batch = prepare_diagram_flowables(
+                references, self.diagrams_dir, width=13*cm,  # Fit within margins
+                max_dpi=self.max_dpi, prefer_vector=self.vector_diagrams
+            )
         
+        try:
+            for part in parts:
+                if part['type'] == 'cover':
+                    story.extend(self._create_cover(part))
+                elif part['type'] == 'toc':
+                    story.extend(self._create_toc(toc_parts or parts))
+                elif part['type'] == 'section_divider':
+                    story.extend(self._create_section_divider(part))
+                elif part['type'] == 'subsection_header':
+                    story.extend(self._create_subsection_header(part))
+                elif part['type'] == 'chapter':
+                    key, ir = next(chapter_irs)
+                    if ir is None and parsed_irs is not None:
+                        ir = next(parsed_irs)
+                        if key:
+                            self._save_chapter_ir(key, ir)
+                    story.extend(self._create_chapter(part, ir, cache_key=key))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+            if self.diagram_batch:
+                self.diagram_batch.close()
         return story
     
+    def _worker_options(self) -> Dict:
+        """Generator options for --jobs worker processes (one process level only)."""
+        return {
+            'output_path': str(self.output_path),
+            'page_size': self.page_size_name,
+            'color_scheme': self.color_scheme,
+            'max_dpi': self.max_dpi,
+            'vector_diagrams': self.vector_diagrams,
+            'use_cache': self.use_cache,
+        }
+    
+    def _chapter_cache_key(self, content: str) -> str:
+        """
+        IR cache key for chapter markdown under the current parser and styles.
+        
+        Args:
+            content: Chapter markdown
+            
+        Returns:
+            Hex digest of the content, PARSER_VERSION, the ReportLab version
+            (cached fragments are ReportLab objects) and the style options
+        """
+        options = f"v{PARSER_VERSION}|reportlab{REPORTLAB_VERSION}|{self.color_scheme}|{self.page_size_name}|"
+        return hashlib.sha256((options + content).encode('utf-8')).hexdigest()[:32]
+    
+    def _load_chapter_ir(self, key: str) -> Optional[Dict]:
+        """Cached chapter IR (see _parse_chapter_ir), or None on a miss."""
+        try:
+            return pickle.loads((self.chapter_cache_dir / f"{key}.pickle").read_bytes())
+        except Exception:
+            return None
+    
+    def _save_chapter_ir(self, key: str, ir: Dict):
+        """Write a chapter IR to the cache atomically (before the PDF is laid out)."""
+        cache_file = self.chapter_cache_dir / f"{key}.pickle"
+        try:
+            self.chapter_cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+            tmp_file.write_bytes(pickle.dumps(ir, protocol=pickle.HIGHEST_PROTOCOL))
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"   ⚠️  Could not cache chapter IR {key}: {e}")
+    
     def _create_cover(self, part: Dict[str, str]) -> List:
         """Create cover page."""
         elements = []
@@ -585,8 +994,19 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         
         return elements
     
-    def _create_chapter(self, part: Dict[str, str]) -> List:
-        """Create chapter from markdown content with full markdown support."""
+    def _create_chapter(self, part: Dict[str, str], ir: Optional[Dict] = None,
+                        cache_key: Optional[str] = None) -> List:
+        """
+        Create chapter from markdown content with full markdown support.
+        
+        Args:
+            part: Chapter part (see _collect_content)
+            ir: Chapter IR from the cache or a --jobs worker (None = parse here)
+            cache_key: IR cache key; a chapter parsed here is cached under it
+            
+        Returns:
+            Chapter flowables
+        """
         elements = []
         
         # Chapter break
@@ -601,358 +1021,172 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         elements.append(Paragraph(f"<b>{chapter_title}</b>", self.styles['ChapterTitle']))
         elements.append(Spacer(1, 0.5*cm))
         
-        # Process markdown content with enhanced parsing
-        lines = part['content'].split('\n')
-        
-        in_code_block = False
-        in_table = False
-        in_list = False
-        in_blockquote = False
-        code_lines = []
-        table_lines = []
-        list_items = []
-        blockquote_lines = []
-        current_list_type = None  # 'bullet' or 'numbered'
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            
-            # Code blocks
-            if line.strip().startswith('```'):
-                if in_code_block:
-                    # End code block
-                    code_text = '\n'.join(code_lines)
-                    # Clean LaTeX artifacts from code blocks
-                    code_text = self._clean_latex_artifacts(code_text)
-                    elements.append(Preformatted(code_text, self.styles['CustomCode']))
-                    elements.append(Spacer(1, 0.3*cm))
-                    code_lines = []
-                in_code_block = not in_code_block
-                i += 1
-                continue
-            
-            if in_code_block:
-                code_lines.append(line)
-                i += 1
-                continue
-            
-            # Markdown tables (detect | at start or in line)
-            if '|' in line and not in_table:
-                # Start collecting table
-                in_table = True
-                table_lines = [line]
-                i += 1
-                continue
-            
-            if in_table:
-                if '|' in line or line.strip().startswith('|'):
-                    table_lines.append(line)
-                    i += 1
-                    continue
-                else:
-                    # End of table, render it
-                    if table_lines:
-                        table_element = self._create_table(table_lines)
-                        if table_element:
-                            elements.append(table_element)
-                            elements.append(Spacer(1, 0.4*cm))
-                    table_lines = []
-                    in_table = False
-                    # Don't increment i, process current line
-                    continue
-            
-            # Bullet lists (-, *, +)
-            if re.match(r'^\s*[-*+]\s+', line):
-                if not in_list or current_list_type != 'bullet':
-                    # Start new bullet list or switch from numbered
-                    if in_list and list_items:
-                        # Finish previous list
-                        elements.extend(self._create_list(list_items, current_list_type))
-                        list_items = []
-                    in_list = True
-                    current_list_type = 'bullet'
-                
-                # Extract bullet item
-                indent = len(line) - len(line.lstrip())
-                content = re.sub(r'^\s*[-*+]\s+', '', line)
-                list_items.append({'indent': indent, 'content': content})
-                i += 1
-                continue
-            
-            # Numbered lists (1. 2. etc.)
-            if re.match(r'^\s*\d+\.\s+', line):
-                if not in_list or current_list_type != 'numbered':
-                    # Start new numbered list or switch from bullet
-                    if in_list and list_items:
-                        # Finish previous list
-                        elements.extend(self._create_list(list_items, current_list_type))
-                        list_items = []
-                    in_list = True
-                    current_list_type = 'numbered'
-                
-                # Extract numbered item
-                indent = len(line) - len(line.lstrip())
-                content = re.sub(r'^\s*\d+\.\s+', '', line)
-                list_items.append({'indent': indent, 'content': content})
-                i += 1
-                continue
-            
-            # If we were in a list and this line doesn't continue it
-            if in_list:
-                # Empty line within list - allow it
-                if not line.strip():
-                    i += 1
-                    continue
-                # Non-list line that's not empty - end the list
-                else:
-                    # End the list
-                    elements.extend(self._create_list(list_items, current_list_type))
-                    list_items = []
-                    in_list = False
-                    current_list_type = None
-                    # Continue to process current line (don't increment i)
-                    # Fall through to process the line below
-            
-            # Blockquotes (> )
-            if line.strip().startswith('> '):
-                if not in_blockquote:
-                    in_blockquote = True
-                    blockquote_lines = []
-                content = line.strip()[2:]  # Remove "> "
-                blockquote_lines.append(content)
-                i += 1
-                continue
-            
-            if in_blockquote:
-                if line.strip().startswith('> '):
-                    content = line.strip()[2:]
-                    blockquote_lines.append(content)
-                    i += 1
-                    continue
-                else:
-                    # End blockquote
-                    elements.extend(self._create_blockquote(blockquote_lines))
-                    blockquote_lines = []
-                    in_blockquote = False
-                    # Don't increment i, process current line (fall through)
-            
-            # Handle diagram placeholders
-            if '--8<--' in line:
-                # Extract diagram filename
-                match = re.search(r'--8<--\s*"?([^"]+\.mmd)"?', line)
-                if match:
-                    diagram_path = match.group(1)
-                    
-                    # Try to embed actual SVG/PNG diagram
-                    if SVG_SUPPORT:
-                        diagram_flowable, diagram_name = create_diagram_flowable(
-                            diagram_path, self.diagrams_dir, width=13*cm  # Fit within margins
-                        )
-                        
-                        if diagram_flowable:
-                            # Successfully loaded diagram - embed it
-                            elements.append(Spacer(1, 0.3*cm))
-                            
-                            # Diagram title
-                            title_text = f"📊 <b>{diagram_name}</b>"
-                            elements.append(Paragraph(title_text, self.styles['CustomHeading3']))
-                            elements.append(Spacer(1, 0.2*cm))
-                            
-                            # Add the actual diagram
-                            elements.append(diagram_flowable)
-                            elements.append(Spacer(1, 0.3*cm))
-                            
-                            i += 1
-                            continue
-                    
-                    # Fallback: Use placeholder if SVG not available
-                    diagram_name = diagram_path.split('/')[-1].replace('.mmd', '').replace('-', ' ').title()
-                    
-                    # Add visual placeholder box
-                    elements.append(Spacer(1, 0.3*cm))
-                    
-                    # Diagram title with icon
-                    placeholder_text = f"📊 <b>Diagram: {diagram_name}</b>"
-                    elements.append(Paragraph(placeholder_text, self.styles['CustomHeading3']))
-                    
-                    # Reference note
-                    note_text = (
-                        f'<i>View this interactive diagram online at:</i><br/>'
-                        f'<font color="#8b5cf6">https://gusafr.github.io/midora-solid-ai/diagrams/</font>'
-                    )
-                    elements.append(Paragraph(note_text, self.styles['CustomBody']))
-                    elements.append(Spacer(1, 0.3*cm))
-                i += 1
-                continue
+        # Parse once (or reuse a cached/worker IR), then build flowables block by block
+        if ir is None:
+            blocks = parse_chapter(part['content'])
+            if cache_key:
+                self.paragraph_log = []  # Record the parsed paragraphs for the cache
+        else:
+            blocks = ir['blocks']
+            for key, parsed in ir['paragraphs']:
+                self.parsed_paragraphs.setdefault(key, []).append(parsed)
+        try:
+            for block in blocks:
+                elements.extend(self._create_block(block))
+            if self.paragraph_log is not None:
+                self._save_chapter_ir(cache_key, {'blocks': blocks, 'paragraphs': self.paragraph_log})
+        finally:
+            self.paragraph_log = None
+            self.parsed_paragraphs.clear()
+        
+        return elements
+    
+    def _parse_chapter_ir(self, content: str) -> Dict:
+        """
+        Chapter IR with every block paragraph already parsed (cached, or built in --jobs workers).
+        
+        The blocks are built once here and discarded; only the parse results
+        of their Paragraphs (cleaned text and fragments) are kept, so the
+        parent skips ReportLab's markup parser for them.
+        
+        Args:
+            content: Chapter markdown
             
-            # Horizontal rules (---, ***, ___)
-            if re.match(r'^\s*(-{3,}|\*{3,}|_{3,})\s*$', line):
-                elements.append(Spacer(1, 0.3*cm))
-                # Create a horizontal line
-                from reportlab.platypus import HRFlowable
-                elements.append(HRFlowable(width="80%", thickness=1, color=self.text_light, 
-                                          spaceAfter=0.3*cm, spaceBefore=0.3*cm))
-                i += 1
-                continue
+        Returns:
+            Dict with blocks (see parse_chapter) and paragraphs, a list of
+            (paragraph key, (text, frags))
+        """
+        blocks = parse_chapter(content)
+        self.paragraph_log = []
+        try:
+            for block in blocks:
+                if block['type'] != 'diagram':  # Diagrams are resolved in the parent
+                    self._create_block(block)
+            return {'blocks': blocks, 'paragraphs': self.paragraph_log}
+        finally:
+            self.paragraph_log = None
+    
+    def _paragraph(self, markup: str, style: ParagraphStyle) -> Paragraph:
+        """
+        Paragraph for block markup, reusing a worker's parse when available.
+        
+        Args:
+            markup: ReportLab paragraph markup
+            style: Paragraph style
             
-            # Headers
-            if line.startswith('# '):
-                i += 1
-                continue  # Skip H1 (already have chapter title)
-            elif line.startswith('## '):
-                text = line[3:].strip()
-                elements.append(Spacer(1, 0.5*cm))
-                elements.append(Paragraph(f"<b>{text}</b>", self.styles['CustomHeading2']))
-                i += 1
-                continue
-            elif line.startswith('### '):
-                text = line[4:].strip()
+        Returns:
+            Paragraph
+        """
+        # Parsing depends on the markup and the style's font only
+        key = (markup, style.fontName, style.fontSize, str(style.textColor))
+        parsed = self.parsed_paragraphs.get(key)
+        if parsed:
+            text, frags = parsed.pop()
+            return Paragraph(text, style, frags=frags)
+        
+        paragraph = Paragraph(markup, style)
+        if self.paragraph_log is not None:
+            self.paragraph_log.append((key, (paragraph.text, paragraph.frags)))
+        return paragraph
+    
+    def _create_block(self, token: Dict) -> List:
+        """Create flowables for one IR block (see parse_chapter)."""
+        token_type = token['type']
+        
+        if token_type == 'paragraph':
+            return [self._paragraph(token['markup'], self.styles['CustomBody'])]
+        
+        if token_type == 'heading':
+            if token['level'] == 2:
+                return [Spacer(1, 0.5*cm),
+                        self._paragraph(f"<b>{token['text']}</b>", self.styles['CustomHeading2'])]
+            if token['level'] == 3:
+                return [Spacer(1, 0.3*cm),
+                        self._paragraph(f"<b>{token['text']}</b>", self.styles['CustomHeading3'])]
+            return []  # Skip H1 (already have chapter title)
+        
+        if token_type == 'list':
+            return self._create_list(token['items'], token['list_type'])
+        
+        if token_type == 'table':
+            table_element = self._create_table(token['rows'])
+            if not table_element:
+                return []
+            return [table_element, Spacer(1, 0.4*cm)]
+        
+        if token_type == 'code':
+            elements = [Preformatted(token['code'], self.styles['CustomCode'])]
+            if token['closed']:
                 elements.append(Spacer(1, 0.3*cm))
-                elements.append(Paragraph(f"<b>{text}</b>", self.styles['CustomHeading3']))
-                i += 1
-                continue
-            
-            # Callout boxes (See also:, Next Steps:, See:, etc.)
-            if re.match(r'^(See also:|Next Steps:|See:|\*\*See also:\*\*|\*\*Next Steps:\*\*|\*\*See:\*\*)', line, re.IGNORECASE):
-                # Collect callout content
-                callout_lines = [line]
-                i += 1
-                while i < len(lines) and lines[i].strip() and not lines[i].startswith('#'):
-                    callout_lines.append(lines[i])
-                    i += 1
-                    if i < len(lines) and not lines[i].strip():
-                        break
-                
-                elements.extend(self._create_callout(callout_lines))
-                continue
-            
-            # Empty lines
-            if not line.strip():
-                i += 1
-                continue
-            
-            # Regular paragraph
-            text = line.strip()
-            if text:
-                # Clean up markdown formatting
-                text = self._format_inline_markdown(text)
-                elements.append(Paragraph(text, self.styles['CustomBody']))
-            
-            i += 1
+            return elements
         
-        # Handle any remaining open blocks
-        if in_code_block and code_lines:
-            code_text = '\n'.join(code_lines)
-            # Clean LaTeX artifacts from code blocks
-            code_text = self._clean_latex_artifacts(code_text)
-            elements.append(Preformatted(code_text, self.styles['CustomCode']))
+        if token_type == 'blockquote':
+            return self._create_blockquote(token['markup'])
         
-        if in_table and table_lines:
-            table_element = self._create_table(table_lines)
-            if table_element:
-                elements.append(table_element)
+        if token_type == 'callout':
+            return self._create_callout(token['markup'])
         
-        if in_list and list_items:
-            elements.extend(self._create_list(list_items, current_list_type))
+        if token_type == 'diagram':
+            return self._create_diagram(token['path'])
         
-        if in_blockquote and blockquote_lines:
-            elements.extend(self._create_blockquote(blockquote_lines))
+        if token_type == 'rule':
+            return [Spacer(1, 0.3*cm),
+                    HRFlowable(width="80%", thickness=1, color=self.text_light,
+                               spaceAfter=0.3*cm, spaceBefore=0.3*cm)]
         
-        return elements
+        return []
     
-    def _clean_latex_artifacts(self, text: str) -> str:
-        """Remove LaTeX/math formatting artifacts from text."""
-        # Remove $...$ math mode patterns - order matters!
-        # First, handle complete $...$ blocks
-        text = re.sub(r'\$([^$]+)\$', r'\1', text)  # Remove $ delimiters around any content
-        
-        # Remove LaTeX commands
-        text = re.sub(r'\\prime', '', text)
-        text = re.sub(r'\\times', '*', text)
-        text = re.sub(r'\\%', '%', text)
-        text = re.sub(r'\\ge', '>=', text)
-        text = re.sub(r'\\le', '<=', text)
-        text = re.sub(r'\\gt', '>', text)
-        text = re.sub(r'\\lt', '<', text)
-        
-        # Remove superscript/subscript notation
-        text = re.sub(r'\^\{[^}]*\}', '', text)
-        text = re.sub(r'_\{[^}]*\}', '', text)
-        
-        # Remove remaining standalone $ (LaTeX delimiters, not currency)
-        text = re.sub(r'\$([<>=:]+)', r'\1', text)  # $>= becomes >=
-        text = re.sub(r'([<>=:]+)\$', r'\1', text)  # >=$ becomes >=
-        text = re.sub(r'\$\|', '', text)  # $| becomes nothing
-        text = re.sub(r'\|\$', '', text)  # |$ becomes nothing
-        text = re.sub(r'(\d)\$', r'\1', text)  # 10$ becomes 10
-        text = re.sub(r'\$(\d)', r'\1', text)  # $10 is kept as currency... wait no, remove the $
-        # Actually for code blocks, we want to remove ALL $ that aren't clearly currency
-        # Currency is $XXX where X is digits, but in code we rarely have currency
-        text = re.sub(r'\$([^$\s])', r'\1', text)  # $ followed by non-space non-$ becomes just that char
-        text = re.sub(r'([^$\s])\$', r'\1', text)  # non-space non-$ followed by $ becomes just that char
-        
-        # Clean up any doubled operators that might result
-        text = re.sub(r'==+', '==', text)
-        text = re.sub(r'>=+', '>=', text)
-        text = re.sub(r'<=+', '<=', text)
-        
-        return text
-
-    def _format_inline_markdown(self, text: str) -> str:
-        """Format inline markdown (bold, italic, code, links)."""
-        # Clean LaTeX artifacts first
-        text = self._clean_latex_artifacts(text)
-
-        # Links [text](url) - style as colored underlined text
-        text = re.sub(
-            r'\[([^\]]+)\]\(([^)]+)\)',
-            r'<font color="#06b6d4"><u>\1</u></font>',
-            text
-        )
+    def _create_diagram(self, diagram_path: str) -> List:
+        """Embed a diagram include (--8<-- "DIAGRAMS/x.mmd"), or a placeholder."""
+        elements = []
+        
+        # Try to embed actual SVG/PNG diagram
+        if SVG_SUPPORT:
+            if self.diagram_batch:
+                diagram_flowable, diagram_name = self.diagram_batch.get(diagram_path)
+            else:
+                diagram_flowable, diagram_name = create_diagram_flowable(
+                    diagram_path, self.diagrams_dir, width=13*cm,  # Fit within margins
+                    max_dpi=self.max_dpi, prefer_vector=self.vector_diagrams
+                )
+            
+            if diagram_flowable:
+                # Successfully loaded diagram - embed it
+                elements.append(Spacer(1, 0.3*cm))
+                
+                # Diagram title
+                title_text = f"📊 <b>{diagram_name}</b>"
+                elements.append(Paragraph(title_text, self.styles['CustomHeading3']))
+                elements.append(Spacer(1, 0.2*cm))
+                
+                # Add the actual diagram
+                elements.append(diagram_flowable)
+                elements.append(Spacer(1, 0.3*cm))
+                return elements
         
-        # Bold **text**
-        text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
+        # Fallback: Use placeholder if SVG not available
+        diagram_name = diagram_path.split('/')[-1].replace('.mmd', '').replace('-', ' ').title()
         
-        # Italic *text*
-        text = re.sub(r'\*(.+?)\*', r'<i>\1</i>', text)
+        # Add visual placeholder box
+        elements.append(Spacer(1, 0.3*cm))
         
-        # Inline code `text`
-        text = re.sub(
-            r'`(.+?)`',
-            r'<font name="Courier" color="#8b5cf6">\1</font>',
-            text
-        )
+        # Diagram title with icon
+        placeholder_text = f"📊 <b>Diagram: {diagram_name}</b>"
+        elements.append(Paragraph(placeholder_text, self.styles['CustomHeading3']))
         
-        return text
+        # Reference note
+        note_text = (
+            f'<i>View this interactive diagram online at:</i><br/>'
+            f'<font color="#8b5cf6">https://gusafr.github.io/midora-solid-ai/diagrams/</font>'
+        )
+        elements.append(Paragraph(note_text, self.styles['CustomBody']))
+        elements.append(Spacer(1, 0.3*cm))
+        return elements
     
-    def _create_table(self, table_lines: List[str]) -> Optional[Table]:
-        """Create a table from markdown table lines."""
-        if not table_lines:
-            return None
-        
-        # Parse table rows
-        rows = []
-        for line in table_lines:
-            # Skip separator lines (|---|---|)
-            if re.match(r'^\s*\|[\s\-:|]+\|\s*$', line):
-                continue
-            
-            # Split by | and clean up
-            cells = [cell.strip() for cell in line.split('|')]
-            # Remove empty first/last elements from leading/trailing |
-            if cells and not cells[0]:
-                cells = cells[1:]
-            if cells and not cells[-1]:
-                cells = cells[:-1]
-            
-            if cells:
-                # Format cell content
-                formatted_cells = [
-                    Paragraph(self._format_inline_markdown(cell), self.styles['CustomBody'])
-                    for cell in cells
-                ]
-                rows.append(formatted_cells)
+    def _create_table(self, rows: List[List[str]]) -> Optional[Table]:
+        """Create a table from the cell markup of its rows (see table_rows)."""
+        rows = [[self._paragraph(cell, self.styles['CustomBody']) for cell in row]
+                for row in rows]
         
         if not rows:
             return None
@@ -994,7 +1228,7 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         
         for item in items:
             indent_level = (item['indent'] - base_indent) // 2  # Assume 2 spaces per level
-            content = self._format_inline_markdown(item['content'])
+            content = item['markup']
             
             # Create paragraph with left indent
             left_indent = 15 + (indent_level * 15)
@@ -1011,23 +1245,16 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
             else:  # numbered
                 bullet_text = '•'  # For simplicity, using bullets for all levels
             
-            para = Paragraph(f"{bullet_text} {content}", bullet_style)
+            para = self._paragraph(f"{bullet_text} {content}", bullet_style)
             elements.append(para)
         
         elements.append(Spacer(1, 0.2*cm))
         return elements
     
-    def _create_blockquote(self, lines: List[str]) -> List:
-        """Create a styled blockquote."""
+    def _create_blockquote(self, text: str) -> List:
+        """Create a styled blockquote from its markup."""
         elements = []
         
-        if not lines:
-            return elements
-        
-        # Combine lines
-        text = ' '.join(lines)
-        text = self._format_inline_markdown(text)
-        
         # Create blockquote style with side border
         blockquote_style = ParagraphStyle(
             'Blockquote',
@@ -1044,23 +1271,15 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         )
         
         elements.append(Spacer(1, 0.2*cm))
-        elements.append(Paragraph(text, blockquote_style))
+        elements.append(self._paragraph(text, blockquote_style))
         elements.append(Spacer(1, 0.2*cm))
         
         return elements
     
-    def _create_callout(self, lines: List[str]) -> List:
+    def _create_callout(self, formatted_text: str) -> List:
         """Create a callout box for cross-references and important notes."""
         elements = []
         
-        if not lines:
-            return elements
-        
-        # Format all lines
-        formatted_text = '<br/>'.join(
-            self._format_inline_markdown(line.strip()) for line in lines
-        )
-        
         # Create callout style with colored background
         callout_style = ParagraphStyle(
             'Callout',
@@ -1076,15 +1295,15 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         )
         
         elements.append(Spacer(1, 0.3*cm))
-        elements.append(Paragraph(formatted_text, callout_style))
+        elements.append(self._paragraph(formatted_text, callout_style))
         elements.append(Spacer(1, 0.3*cm))
         
         return elements
     
-    def _generate_pdf(self, story: List):
-        """Generate PDF from story."""
-        doc = SimpleDocTemplate(
-            str(self.output_path),
+    def _doc_template(self, path: Path) -> BookDocTemplate:
+        """Document template shared by the single-pass and sharded builds."""
+        return BookDocTemplate(
+            str(path),
             pagesize=self.page_size,
             rightMargin=2*cm,
             leftMargin=2*cm,
@@ -1093,10 +1312,227 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
             title="SOLID.AI Framework",
             author="SOLID.AI Framework Team"
         )
+    
+    def _generate_pdf(self, story: List):
+        """Generate PDF from story."""
+        doc = self._doc_template(self.output_path)
         
         # Build PDF
         doc.build(story, onFirstPage=self._draw_cover_background, onLaterPages=self._add_page_number)
     
+    def _generate_sharded(self, parts: List[Dict[str, str]]):
+        """
+        Lay out the book shard by shard in --jobs processes and merge the PDFs.
+        
+        Shards are cached in SHARD_CACHE_DIR by content and options, without
+        page numbers, so an unchanged chapter is reused wherever it lands in
+        the book; _merge_shards numbers the pages afterwards.
+        
+        Args:
+            parts: Content parts (see _collect_content)
+        """
+        shards = split_shards(parts)
+        toc_parts = [{'type': part['type'], 'title': part['title']}
+                     for part in parts if part['type'] == 'chapter']
+        for shard in shards:
+            if any(part['type'] == 'toc' for part in shard['parts']):
+                shard['toc_parts'] = toc_parts
+            shard['key'] = self._shard_cache_key(shard)
+        
+        misses = []
+        for shard in shards:
+            shard['info'] = self._load_shard_info(shard['key']) if self.use_cache else None
+            if shard['info'] is None:
+                misses.append(shard)
+        
+        print(f"📝 Step 2/4: Rendering {len(misses)} of {len(shards)} shards "
+              f"({len(shards) - len(misses)} cached)...")
+        start = time.perf_counter()
+        if self.jobs > 1 and len(misses) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(misses)),
+                                     initializer=_init_book_worker,
+                                     initargs=(self._worker_options(),)) as pool:
+                # Longest shards first so they do not finish last
+                order = sorted(misses, key=self._shard_size, reverse=True)
+                for shard, info in zip(order, pool.map(_render_shard_in_worker, order)):
+                    shard['info'] = info
+        else:
+            for shard in misses:
+                shard['info'] = self._render_shard(shard)
+        if misses:
+            longest = max(shard['info']['seconds'] for shard in misses)
+            print(f"   ✓ Rendered in {time.perf_counter() - start:.1f}s "
+                  f"(longest shard {longest:.1f}s)")
+        
+        print("📄 Step 3/4: Merging shards...")
+        self._merge_shards(shards)
+        
+        # Shards of edited chapters or other options are never reused
+        removed = prune_cache_dir(self.shard_cache_dir, {shard['key'] for shard in shards})
+        if removed:
+            print(f"   ✓ Pruned {removed} stale shard cache files")
+    
+    def _shard_size(self, shard: Dict) -> int:
+        """Markdown size of a shard (to schedule large shards first)."""
+        return sum(len(part.get('content', '')) for part in shard['parts'])
+    
+    def _shard_cache_key(self, shard: Dict) -> str:
+        """
+        Shard cache key: its parts, layout options and diagram images.
+        
+        Args:
+            shard: Shard dict (see split_shards)
+            
+        Returns:
+            Hex digest
+        """
+        diagrams = []
+        if SVG_SUPPORT:
+            index = get_diagram_image_index(self.diagrams_dir)
+            for part in shard['parts']:
+                for reference in find_diagram_references(part.get('content', '')):
+                    for fmt, entry in sorted(index.formats(Path(reference).stem).items()):
+                        stat = entry['path'].stat()
+                        diagrams.append([reference, fmt, stat.st_size, stat.st_mtime_ns])
+        
+        source = json.dumps({
+            'version': PARSER_VERSION,
+            'reportlab': REPORTLAB_VERSION,
+            'svg_support': SVG_SUPPORT,
+            'options': [self.page_size_name, self.color_scheme, self.max_dpi, self.vector_diagrams],
+            'parts': shard['parts'],
+            'toc_parts': shard.get('toc_parts'),
+            'keep_leading_break': shard['keep_leading_break'],
+            'diagrams': diagrams,
+        }, sort_keys=True)
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
+    
+    def _load_shard_info(self, key: str) -> Optional[Dict]:
+        """Page count and bookmarks of a cached shard, or None on a miss."""
+        try:
+            with open(self.shard_cache_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not (self.shard_cache_dir / f"{key}.pdf").exists():
+            return None
+        return info
+    
+    def _render_shard(self, shard: Dict) -> Dict:
+        """
+        Lay out one shard to SHARD_CACHE_DIR/<key>.pdf (runs in --jobs workers).
+        
+        Pages get the cover background or the running header, but no page
+        number: the shard does not know where it lands in the book.
+        
+        Args:
+            shard: Shard dict (see split_shards and _generate_sharded)
+            
+        Returns:
+            Dict with pages, bookmarks (title, page index) and seconds
+        """
+        start = time.perf_counter()
+        story = self._build_story(shard['parts'], shard.get('toc_parts'))
+        if story and isinstance(story[0], PageBreak) and not shard['keep_leading_break']:
+            story = story[1:]
+        
+        self.shard_cache_dir.mkdir(parents=True, exist_ok=True)
+        shard_file = self.shard_cache_dir / f"{shard['key']}.pdf"
+        tmp_file = shard_file.with_name(f"{shard_file.name}.{os.getpid()}.tmp")
+        doc = self._doc_template(tmp_file)
+        first_page = (self._draw_cover_background if shard['parts'][0]['type'] == 'cover'
+                      else self._draw_page_header)
+        doc.build(story, onFirstPage=first_page, onLaterPages=self._draw_page_header)
+        os.replace(tmp_file, shard_file)
+        
+        # The sidecar is written last: it marks the shard as complete
+        info = {'pages': doc.page, 'bookmarks': doc.bookmarks}
+        info_file = shard_file.with_suffix('.json')
+        tmp_file = info_file.with_name(f"{info_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp_file, info_file)
+        
+        if SVG_SUPPORT:
+            save_image_metadata()
+        return {**info, 'seconds': time.perf_counter() - start}
+    
+    def _merge_shards(self, shards: List[Dict]):
+        """
+        Concatenate shard PDFs into the book.
+        
+        Identical fonts and images from different shards are written once,
+        page numbers are drawn by an overlay (continuous across shards), and
+        the outline is rebuilt from the shard bookmarks.
+        
+        Args:
+            shards: Rendered shards (see _generate_sharded)
+        """
+        from pdfrw import PdfReader, PdfWriter, PdfDict, PdfArray, PdfName, PdfString, IndirectPdfDict
+        
+        pages = []
+        bookmarks = []
+        for shard in shards:
+            reader = PdfReader(str(self.shard_cache_dir / f"{shard['key']}.pdf"))
+            bookmarks.extend((title, len(pages) + index) for title, index in shard['info']['bookmarks'])
+            pages.extend(reader.pages)
+        
+        # Page numbers (the cover has none): the overlay page's drawing is
+        # appended to the page content, its fonts renamed to avoid clashes
+        if len(pages) > 1:
+            overlay = PdfReader(fdata=self._page_number_overlay(range(2, len(pages) + 1)))
+            save_state = PdfDict(indirect=True, stream='q')
+            for page, number_page in zip(pages[1:], overlay.pages):
+                stream = number_page.Contents.stream
+                resources = page.Resources
+                if resources.Font is None:
+                    resources.Font = PdfDict()
+                for name, font in number_page.Resources.Font.items():
+                    stream = stream.replace(f"{name} ", f"/PageNumber{name[1:]} ")
+                    resources.Font[PdfName(f"PageNumber{name[1:]}")] = font
+                contents = page.Contents
+                contents = list(contents) if isinstance(contents, PdfArray) else [contents]
+                page.Contents = PdfArray([save_state] + contents +
+                                         [PdfDict(indirect=True, stream='Q\n' + stream)])
+        shared = dedupe_page_resources(pages)
+        print(f"   ✓ Merged {len(pages)} pages from {len(shards)} shards "
+              f"({shared} duplicate fonts/images shared)")
+        
+        writer = PdfWriter(compress=True)  # Compresses the new page number streams; shard streams already are
+        writer.addpages(pages)
+        writer.trailer.Info = IndirectPdfDict(
+            Title=PdfString.encode("SOLID.AI Framework"),
+            Author=PdfString.encode("SOLID.AI Framework Team"),
+            Producer=PdfString.encode("ReportLab PDF Library - www.reportlab.com (sharded, pdfrw)")
+        )
+        
+        # Outline (flat, like BookDocTemplate's)
+        if bookmarks:
+            outlines = IndirectPdfDict(Type=PdfName.Outlines, Count=len(bookmarks))
+            entries = [IndirectPdfDict(Title=PdfString.encode(title), Parent=outlines,
+                                       Dest=PdfArray([pages[index], PdfName.Fit]))
+                       for title, index in bookmarks]
+            for previous, entry in zip(entries, entries[1:]):
+                previous.Next = entry
+                entry.Prev = previous
+            outlines.First = entries[0]
+            outlines.Last = entries[-1]
+            writer.trailer.Root.Outlines = outlines
+        
+        tmp_file = self.output_path.with_name(f"{self.output_path.name}.{os.getpid()}.tmp")
+        writer.write(str(tmp_file))
+        os.replace(tmp_file, self.output_path)
+    
+    def _page_number_overlay(self, page_numbers) -> bytes:
+        """Uncompressed PDF with one page per number, drawn as _add_page_number draws it."""
+        buffer = io.BytesIO()
+        overlay = canvas.Canvas(buffer, pagesize=self.page_size, pageCompression=0)
+        for page_number in page_numbers:
+            self._draw_page_number(overlay, page_number)
+            overlay.showPage()
+        overlay.save()
+        return buffer.getvalue()
+    
     def _draw_cover_background(self, canvas_obj, doc):
         """Draw gradient background on cover page."""
         canvas_obj.saveState()
@@ -1117,7 +1553,12 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         canvas_obj.restoreState()
     
     def _add_page_number(self, canvas_obj, doc):
-        """Add page number to footer."""
+        """Add header and page number to every page after the cover."""
+        self._draw_page_header(canvas_obj, doc)
+        self._draw_page_number(canvas_obj, canvas_obj.getPageNumber())
+    
+    def _draw_page_header(self, canvas_obj, doc=None):
+        """Draw the running header."""
         canvas_obj.saveState()
         
         page_width, page_height = self.page_size
@@ -1127,9 +1568,18 @@ The SOLID.AI Adoption Pack includes 11 ready-to-use YAML templates for implement
         canvas_obj.setFont('Helvetica', 9)
         canvas_obj.drawCentredString(page_width / 2, page_height - 1.5*cm, "SOLID.AI Framework")
         
+        canvas_obj.restoreState()
+    
+    def _draw_page_number(self, canvas_obj, page_number: int):
+        """Draw the page number in the footer."""
+        canvas_obj.saveState()
+        
+        page_width, page_height = self.page_size
+        
         # Page number
+        canvas_obj.setFillColor(self.text_light)
         canvas_obj.setFont('Helvetica', 9)
-        canvas_obj.drawRightString(page_width - 2*cm, 1*cm, str(canvas_obj.getPageNumber()))
+        canvas_obj.drawRightString(page_width - 2*cm, 1*cm, str(page_number))
         
         canvas_obj.restoreState()
 
@@ -1168,8 +1618,45 @@ def main():
         default='color',
         help='Color scheme (default: color)'
     )
+    parser.add_argument(
+        '--max-dpi',
+        default=None,
+        help='Downsample diagram images: screen (150 DPI), print (300 DPI) or a DPI value '
+             '(default: embed full resolution)'
+    )
+    parser.add_argument(
+        '--vector-diagrams',
+        action='store_true',
+        help='Prefer SVG diagrams, embedded once as vector form XObjects (default: PNG)'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Number of processes parsing chapters in parallel, 0=CPU cores (default: 1)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Re-parse every chapter (and re-render every shard) instead of reusing .cache'
+    )
+    parser.add_argument(
+        '--sharded',
+        action='store_true',
+        help='Lay out chapters as separate PDFs in --jobs processes, reuse unchanged ones '
+             'from .cache/shards and merge them (requires pdfrw)'
+    )
     
     args = parser.parse_args()
+    if args.max_dpi and SVG_SUPPORT:
+        try:
+            resolve_max_dpi(args.max_dpi)
+        except ValueError as e:
+            parser.error(f"--max-dpi: {e}")
+    
+    if args.sharded and not PDFRW_AVAILABLE:
+        print("⚠️  --sharded needs pdfrw (pip install pdfrw), building in one pass")
+        args.sharded = False
     
     # Show SVG support status
     if SVG_SUPPORT:
@@ -1184,7 +1671,12 @@ def main():
         include_playbooks=args.include_playbooks,
         include_adoption=args.include_adoption,
         page_size=args.page_size,
-        color_scheme=args.color_scheme
+        color_scheme=args.color_scheme,
+        max_dpi=args.max_dpi,
+        vector_diagrams=args.vector_diagrams,
+        jobs=args.jobs,
+        use_cache=not args.no_cache,
+        sharded=args.sharded
     )
     
     generator.generate()
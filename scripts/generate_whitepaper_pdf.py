@@ -44,6 +44,16 @@ except ImportError as e:
     print("  pip install reportlab markdown2 pygments")
     sys.exit(1)
 
+# Resolve duplicate diagrams to their canonical image and embed each image once (optional)
+try:
+    from svg_helper import canonical_image_path, shared_image, save_image_metadata
+except ImportError:
+    canonical_image_path = None
+    shared_image = Image
+    save_image_metadata = lambda: None
+
+from latex_cleaner import clean_latex_artifacts
+
 
 class WhitepaperPDFGenerator:
     """Generate academic whitepaper PDF with Google Research style."""
@@ -267,6 +277,13 @@ class WhitepaperPDFGenerator:
         
         canvas.restoreState()
         
+    def _diagram_image(self, name: str) -> str:
+        """Image path for a whitepaper figure, shared with identical diagrams."""
+        image_path = self.DIAGRAM_MAPPING.get(name, f'DIAGRAMS/images/png/{name}.png')
+        if canonical_image_path:
+            image_path = str(canonical_image_path(Path(image_path)))
+        return image_path
+    
     def _parse_markdown(self, content: str) -> List:
         """Convert markdown to ReportLab flowables."""
         story = []
@@ -336,25 +353,25 @@ class WhitepaperPDFGenerator:
                         
                         # Check heading first for explicit figure references
                         if 'figure 1' in heading_lower or '1. solid' in heading_lower or 'architecture layer' in heading_lower:
-                            diagram_path = 'DIAGRAMS/images/png/solid-ai-architecture.png'
+                            diagram_path = self._diagram_image('solid-ai-architecture')
                         elif 'figure 2' in heading_lower or '2. solid' in heading_lower or 'automation mesh' in heading_lower:
-                            diagram_path = 'DIAGRAMS/images/png/sipoc-automation-pattern.png'
+                            diagram_path = self._diagram_image('automation-mesh')
                         elif 'figure 3' in heading_lower or '3. solid' in heading_lower or 'data spine' in heading_lower:
-                            diagram_path = 'DIAGRAMS/images/png/data-spine-architecture.png'
+                            diagram_path = self._diagram_image('data-spine-architecture')
                         elif 'figure 4' in heading_lower or '4. solid' in heading_lower or 'human-ai collaboration' in heading_lower or 'collaboration loop' in heading_lower:
-                            diagram_path = 'DIAGRAMS/images/png/cognitive-decision-flow.png'
+                            diagram_path = self._diagram_image('cognitive-decision-flow')
                         else:
                             # Fallback to content-based detection
                             if 'layer 6' in diagram_text or 'layer 1' in diagram_text or 'l6[' in diagram_text:
-                                diagram_path = 'DIAGRAMS/images/png/solid-ai-architecture.png'
+                                diagram_path = self._diagram_image('solid-ai-architecture')
                             elif 'sipoc' in diagram_text or 'supplier' in diagram_text and 'output' in diagram_text:
-                                diagram_path = 'DIAGRAMS/images/png/sipoc-automation-pattern.png'
+                                diagram_path = self._diagram_image('automation-mesh')
                             elif 'automation mesh' in diagram_text or 'orchestration' in diagram_text:
-                                diagram_path = 'DIAGRAMS/images/png/sipoc-automation-pattern.png'
+                                diagram_path = self._diagram_image('automation-mesh')
                             elif 'data spine' in diagram_text or 'canonical' in diagram_text or 'event streaming' in diagram_text:
-                                diagram_path = 'DIAGRAMS/images/png/data-spine-architecture.png'
+                                diagram_path = self._diagram_image('data-spine-architecture')
                             elif 'sequencediagram' in diagram_text or ('participant' in diagram_text and 'human' in diagram_text):
-                                diagram_path = 'DIAGRAMS/images/png/cognitive-decision-flow.png'
+                                diagram_path = self._diagram_image('cognitive-decision-flow')
                         
                         # print(f"DEBUG: Selected diagram path: {diagram_path}")
                         if diagram_path:
@@ -374,7 +391,7 @@ class WhitepaperPDFGenerator:
                             try:
                                 # Add some space before diagram
                                 spacer_before = Spacer(1, 3*mm)
-                                img = Image(diagram_path, width=15*cm, height=10*cm, kind='proportional')
+                                img = shared_image(diagram_path, width=15*cm, height=10*cm, kind='proportional')
                                 spacer_after = Spacer(1, 3*mm)
                                 
                                 if in_entity_section:
@@ -416,7 +433,7 @@ class WhitepaperPDFGenerator:
                     # print(f"DEBUG: Code block end at {i}")
                     code_text = '\n'.join(code_block)
                     # Clean LaTeX artifacts from code blocks - comprehensive cleanup
-                    code_text = self._clean_latex_artifacts(code_text)
+                    code_text = clean_latex_artifacts(code_text)
                     if code_text.strip():  # Only add if not empty
                         elem = Preformatted(code_text, self.styles['AcademicCode'])
                         if in_entity_section:
@@ -573,48 +590,10 @@ class WhitepaperPDFGenerator:
         
         return story
     
-    def _clean_latex_artifacts(self, text: str) -> str:
-        """Remove LaTeX/math formatting artifacts from text."""
-        # Remove $...$ math mode patterns - order matters!
-        # First, handle complete $...$ blocks
-        text = re.sub(r'\$([^$]+)\$', r'\1', text)  # Remove $ delimiters around any content
-        
-        # Remove LaTeX commands
-        text = re.sub(r'\\prime', '', text)
-        text = re.sub(r'\\times', '*', text)
-        text = re.sub(r'\\%', '%', text)
-        text = re.sub(r'\\ge', '>=', text)
-        text = re.sub(r'\\le', '<=', text)
-        text = re.sub(r'\\gt', '>', text)
-        text = re.sub(r'\\lt', '<', text)
-        
-        # Remove superscript/subscript notation
-        text = re.sub(r'\^\{[^}]*\}', '', text)
-        text = re.sub(r'_\{[^}]*\}', '', text)
-        
-        # Remove remaining standalone $ (LaTeX delimiters, not currency)
-        text = re.sub(r'\$([<>=:]+)', r'\1', text)  # $>= becomes >=
-        text = re.sub(r'([<>=:]+)\$', r'\1', text)  # >=$ becomes >=
-        text = re.sub(r'\$\|', '', text)  # $| becomes nothing
-        text = re.sub(r'\|\$', '', text)  # |$ becomes nothing
-        text = re.sub(r'(\d)\$', r'\1', text)  # 10$ becomes 10
-        text = re.sub(r'\$(\d)', r'\1', text)  # $10 is kept as currency... wait no, remove the $
-        # Actually for code blocks, we want to remove ALL $ that aren't clearly currency
-        # Currency is $XXX where X is digits, but in code we rarely have currency
-        text = re.sub(r'\$([^$\s])', r'\1', text)  # $ followed by non-space non-$ becomes just that char
-        text = re.sub(r'([^$\s])\$', r'\1', text)  # non-space non-$ followed by $ becomes just that char
-        
-        # Clean up any doubled operators that might result
-        text = re.sub(r'==+', '==', text)
-        text = re.sub(r'>=+', '>=', text)
-        text = re.sub(r'<=+', '<=', text)
-        
-        return text
-    
     def _process_inline_markdown(self, text: str) -> str:
         """Process inline markdown (bold, italic, code, links)."""
         # Clean LaTeX artifacts first
-        text = self._clean_latex_artifacts(text)
+        text = clean_latex_artifacts(text)
         
         # Escape XML characters
         text = text.replace('&', '&amp;')
@@ -731,6 +710,7 @@ class WhitepaperPDFGenerator:
         
         # Build PDF
         doc.build(story, onFirstPage=self._create_header_footer, onLaterPages=self._create_header_footer)
+        save_image_metadata()
         
         print(f"\n✅ Whitepaper PDF generated successfully!")
         print(f"   📁 {self.output_path.absolute()}")
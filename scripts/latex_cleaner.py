@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+LaTeX artifact cleaner shared by the PDF generators
+
+Strips math-mode leftovers ($...$, \\times, ^{...}, stray $) from markdown
+text before it is handed to ReportLab. clean_latex_artifacts() gives the
+same output as the original sequence of ~20 re.sub passes
+(clean_latex_artifacts_reference), but most text is returned after a single
+scan for trigger characters, and the LaTeX commands and doubled operators
+are each replaced in one pass through a dispatch table.
+
+Usage:
+    python scripts/latex_cleaner.py --benchmark
+    python scripts/latex_cleaner.py --benchmark DOCS/*.md --repeat 50
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+import argparse
+
+
+# Text without any of these characters is never changed
+TRIGGER_PATTERN = re.compile(r'[$\\{=]')
+
+MATH_SPAN_PATTERN = re.compile(r'\$([^$]+)\$')
+
+# LaTeX commands -> replacement (\prime is removed in its own pass first:
+# deleting it can join a preceding backslash to the text after it)
+LATEX_COMMANDS = {
+    'times': '*',
+    '%': '%',
+    'ge': '>=',
+    'le': '<=',
+    'gt': '>',
+    'lt': '<',
+}
+LATEX_COMMAND_PATTERN = re.compile(r'\\(times|%|ge|le|gt|lt)')
+
+SUPERSCRIPT_PATTERN = re.compile(r'\^\{[^}]*\}')
+SUBSCRIPT_PATTERN = re.compile(r'_\{[^}]*\}')
+
+# Standalone $ left after the math spans, in the original order. Only needed
+# when a $ touches another $ or a |; otherwise LONE_DOLLAR_PATTERN is equivalent.
+DOLLAR_PASSES = [
+    (re.compile(r'\$([<>=:]+)'), r'\1'),  # $>= becomes >=
+    (re.compile(r'([<>=:]+)\$'), r'\1'),  # >=$ becomes >=
+    (re.compile(r'\$\|'), ''),  # $| becomes nothing
+    (re.compile(r'\|\$'), ''),  # |$ becomes nothing
+    (re.compile(r'(\d)\$'), r'\1'),  # 10$ becomes 10
+    (re.compile(r'\$(\d)'), r'\1'),  # $10 becomes 10
+    (re.compile(r'\$([^$\s])'), r'\1'),  # $ followed by non-space non-$ becomes just that char
+    (re.compile(r'([^$\s])\$'), r'\1'),  # non-space non-$ followed by $ becomes just that char
+]
+LONE_DOLLAR_PATTERN = re.compile(r'\$(?=\S)|(?<=\S)\$')
+
+# ==+ -> ==, then >=+ -> >=, then <=+ -> <= (in one pass)
+OPERATOR_RUN_PATTERN = re.compile(r'([<>])=+|==+')
+
+
+def _replace_latex_command(match: re.Match) -> str:
+    """Dispatch a LaTeX command match to its replacement."""
+    return LATEX_COMMANDS[match.group(1)]
+
+
+def _replace_operator_run(match: re.Match) -> str:
+    """Collapse a run of = (after < or >) to a single operator."""
+    return match.group(1) + '=' if match.group(1) else '=='
+
+
+def clean_latex_artifacts(text: str) -> str:
+    """
+    Remove LaTeX/math formatting artifacts from text.
+    
+    Args:
+        text: Paragraph, table cell, list item or code block text
+    
+    Returns:
+        Cleaned text (identical to clean_latex_artifacts_reference)
+    """
+    if not TRIGGER_PATTERN.search(text):
+        return text
+    
+    # Remove $ delimiters around any content
+    if '$' in text:
+        text = MATH_SPAN_PATTERN.sub(r'\1', text)
+    
+    # LaTeX commands
+    if '\\' in text:
+        if '\\prime' in text:
+            text = text.replace('\\prime', '')
+        text = LATEX_COMMAND_PATTERN.sub(_replace_latex_command, text)
+    
+    # Superscript/subscript notation
+    if '^{' in text:
+        text = SUPERSCRIPT_PATTERN.sub('', text)
+    if '_{' in text:
+        text = SUBSCRIPT_PATTERN.sub('', text)
+    
+    # Remaining standalone $ (LaTeX delimiters, not currency)
+    if '$' in text:
+        if '$$' in text or '$|' in text or '|$' in text:
+            for pattern, replacement in DOLLAR_PASSES:
+                text = pattern.sub(replacement, text)
+        else:
+            text = LONE_DOLLAR_PATTERN.sub('', text)
+    
+    # Clean up any doubled operators that might result
+    if '=' in text:
+        text = OPERATOR_RUN_PATTERN.sub(_replace_operator_run, text)
+    
+    return text
+
+
+def clean_latex_artifacts_reference(text: str) -> str:
+    """
+    The original pass-by-pass cleaner, kept to verify clean_latex_artifacts.
+    
+    Args:
+        text: Text to clean
+    
+    Returns:
+        Cleaned text
+    """
+    text = re.sub(r'\$([^$]+)\$', r'\1', text)
+    
+    text = re.sub(r'\\prime', '', text)
+    text = re.sub(r'\\times', '*', text)
+    text = re.sub(r'\\%', '%', text)
+    text = re.sub(r'\\ge', '>=', text)
+    text = re.sub(r'\\le', '<=', text)
+    text = re.sub(r'\\gt', '>', text)
+    text = re.sub(r'\\lt', '<', text)
+    
+    text = re.sub(r'\^\{[^}]*\}', '', text)
+    text = re.sub(r'_\{[^}]*\}', '', text)
+    
+    for pattern, replacement in DOLLAR_PASSES:
+        text = pattern.sub(replacement, text)
+    
+    text = re.sub(r'==+', '==', text)
+    text = re.sub(r'>=+', '>=', text)
+    text = re.sub(r'<=+', '<=', text)
+    
+    return text
+
+
+def benchmark(texts: List[str], repeat: int = 10) -> int:
+    """
+    Compare the fused and reference cleaners on a corpus.
+    
+    Args:
+        texts: Inputs (e.g., the lines of the book's markdown files)
+        repeat: Passes over the corpus per cleaner
+    
+    Returns:
+        Number of inputs where the two cleaners disagree
+    """
+    size_mb = sum(len(text.encode('utf-8')) for text in texts) / 1e6
+    print(f"📄 {len(texts)} inputs, {size_mb:.2f} MB, {repeat} pass(es)")
+    
+    for name, cleaner in (('reference', clean_latex_artifacts_reference),
+                          ('fused', clean_latex_artifacts)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                cleaner(text)
+        elapsed = time.perf_counter() - start
+        print(f"   {name:<10} {elapsed * 1000:8.1f} ms  {size_mb * repeat / elapsed:8.1f} MB/s")
+    
+    mismatches = [text for text in texts
+                  if clean_latex_artifacts(text) != clean_latex_artifacts_reference(text)]
+    for text in mismatches[:5]:
+        print(f"❌ Output differs for: {text[:80]!r}")
+    return len(mismatches)
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description='Clean LaTeX artifacts from markdown text'
+    )
+    parser.add_argument(
+        'files',
+        nargs='*',
+        help='Markdown files (default: DOCS, PLAYBOOKS and ADOPTION)'
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='Measure throughput against the reference cleaner and check identical output'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=10,
+        help='Passes over the corpus when benchmarking (default: 10)'
+    )
+    args = parser.parse_args()
+    
+    if args.files:
+        files = [Path(f) for f in args.files]
+    else:
+        root = Path(__file__).resolve().parent.parent
+        files = sorted(path for folder in ('DOCS', 'PLAYBOOKS', 'ADOPTION')
+                       for path in (root / folder).rglob('*.md'))
+    
+    if not args.benchmark:
+        for path in files:
+            sys.stdout.write(clean_latex_artifacts(path.read_text(encoding='utf-8')))
+        return 0
+    
+    # Lines and whole files: the generators clean both single lines and code blocks
+    sources = [path.read_text(encoding='utf-8') for path in files]
+    texts = [line for source in sources for line in source.split('\n')] + sources
+    mismatches = benchmark(texts, max(1, args.repeat))
+    if mismatches:
+        print(f"\n❌ {mismatches} input(s) differ from the reference cleaner")
+        return 1
+    print("\n✅ Output identical to the reference cleaner")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
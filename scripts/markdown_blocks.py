@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Markdown block tokenizer for the PDF book
+
+Splits a chapter into a flat stream of block tokens in one pass over its
+lines. Tokens are plain dicts (picklable, JSON-serializable) so the parse
+stage can be timed, cached and run separately from building flowables.
+
+Token types:
+    heading     {'level': 1-3, 'text'}
+    paragraph   {'text'}                      (one per source line)
+    list        {'list_type': 'bullet'|'numbered', 'items': [{'indent', 'content'}]}
+    table       {'lines'}                     (raw rows, including separators)
+    code        {'text', 'closed'}            (closed = fence was terminated)
+    blockquote  {'lines'}                     (text after "> ")
+    diagram     {'path'}                      (--8<-- "DIAGRAMS/x.mmd" include)
+    callout     {'lines'}                     (See also: / Next Steps: / See: block)
+    rule        {}                            (---, ***, ___)
+
+Usage:
+    python scripts/markdown_blocks.py DOCS/00-overview.md
+    python scripts/markdown_blocks.py DOCS/*.md --repeat 20
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+import argparse
+
+
+TOKEN_TYPES = ('heading', 'paragraph', 'list', 'table', 'code', 'blockquote',
+               'diagram', 'callout', 'rule')
+
+# Applied to the line with leading whitespace removed
+BULLET_PATTERN = re.compile(r'[-*+]\s+')
+NUMBERED_PATTERN = re.compile(r'\d+\.\s+')
+RULE_PATTERN = re.compile(r'(?:-{3,}|\*{3,}|_{3,})\s*$')
+# Applied to the raw line
+CALLOUT_PATTERN = re.compile(
+    r'(?:See also:|Next Steps:|See:|\*\*See also:\*\*|\*\*Next Steps:\*\*|\*\*See:\*\*)',
+    re.IGNORECASE
+)
+DIAGRAM_INCLUDE_PATTERN = re.compile(r'--8<--\s*"?([^"]+\.mmd)"?')
+
+HEADING_PREFIXES = (('# ', 1), ('## ', 2), ('### ', 3))
+
+
+def tokenize_blocks(markdown: str) -> List[Dict]:
+    """
+    Tokenize markdown into block tokens (see module docstring).
+    
+    Each line is examined once. Tables start on a line beginning with "|";
+    a list, table or blockquote ends at the first line that does not
+    continue it (blank lines inside a list are skipped).
+    
+    Args:
+        markdown: Markdown source of one chapter
+    
+    Returns:
+        Tokens in document order
+    """
+    tokens: List[Dict] = []
+    lines = markdown.split('\n')
+    line_count = len(lines)
+    
+    block = None  # open list/table/blockquote token
+    code_lines = None  # lines of an open code fence
+    
+    i = 0
+    while i < line_count:
+        line = lines[i]
+        i += 1
+        stripped = line.lstrip()
+        text = stripped.rstrip()
+        
+        # Code fences
+        if text.startswith('```'):
+            if code_lines is None:
+                block = None
+                code_lines = []
+            else:
+                tokens.append({'type': 'code', 'text': '\n'.join(code_lines), 'closed': True})
+                code_lines = None
+            continue
+        if code_lines is not None:
+            code_lines.append(line)
+            continue
+        
+        first = text[:1]
+        
+        # Tables
+        if first == '|':
+            if block is None or block['type'] != 'table':
+                block = {'type': 'table', 'lines': []}
+                tokens.append(block)
+            block['lines'].append(line)
+            continue
+        
+        # Lists
+        match = None
+        if first in ('-', '*', '+'):
+            match = BULLET_PATTERN.match(stripped)
+            list_type = 'bullet'
+        elif first.isdigit():
+            match = NUMBERED_PATTERN.match(stripped)
+            list_type = 'numbered'
+        if match:
+            if block is None or block['type'] != 'list' or block['list_type'] != list_type:
+                block = {'type': 'list', 'list_type': list_type, 'items': []}
+                tokens.append(block)
+            block['items'].append({'indent': len(line) - len(stripped),
+                                   'content': stripped[match.end():]})
+            continue
+        
+        if not text:
+            # Blank lines end tables and blockquotes but not lists
+            if block is not None and block['type'] != 'list':
+                block = None
+            continue
+        
+        # Blockquotes
+        if text.startswith('> '):
+            if block is None or block['type'] != 'blockquote':
+                block = {'type': 'blockquote', 'lines': []}
+                tokens.append(block)
+            block['lines'].append(text[2:])
+            continue
+        block = None
+        
+        # Diagram includes (lines without a .mmd path are dropped)
+        if '--8<--' in line:
+            match = DIAGRAM_INCLUDE_PATTERN.search(line)
+            if match:
+                tokens.append({'type': 'diagram', 'path': match.group(1)})
+            continue
+        
+        # Horizontal rules
+        if first in ('-', '*', '_') and RULE_PATTERN.match(stripped):
+            tokens.append({'type': 'rule'})
+            continue
+        
+        # Headings (H1-H3; deeper levels stay paragraphs)
+        if first == '#' and line[:1] == '#':
+            level = next((level for prefix, level in HEADING_PREFIXES if line.startswith(prefix)), 0)
+            if level:
+                tokens.append({'type': 'heading', 'level': level,
+                               'text': line[level + 1:].strip()})
+                continue
+        
+        # Callouts run until a blank line or a heading
+        if CALLOUT_PATTERN.match(line):
+            callout_lines = [line]
+            while i < line_count and lines[i].strip() and not lines[i].startswith('#'):
+                callout_lines.append(lines[i])
+                i += 1
+            tokens.append({'type': 'callout', 'lines': callout_lines})
+            continue
+        
+        tokens.append({'type': 'paragraph', 'text': text})
+    
+    if code_lines:
+        tokens.append({'type': 'code', 'text': '\n'.join(code_lines), 'closed': False})
+    return tokens
+
+
+def main() -> int:
+    """Tokenize markdown files and report token counts and throughput."""
+    parser = argparse.ArgumentParser(
+        description='Tokenize markdown files into PDF book blocks'
+    )
+    parser.add_argument('files', nargs='+', help='Markdown files')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Tokenize each file this many times for timing (default: 1)'
+    )
+    args = parser.parse_args()
+    
+    sources = [Path(f).read_text(encoding='utf-8') for f in args.files]
+    counts = {token_type: 0 for token_type in TOKEN_TYPES}
+    start = time.perf_counter()
+    for _ in range(max(1, args.repeat)):
+        for source in sources:
+            tokens = tokenize_blocks(source)
+    elapsed = time.perf_counter() - start
+    for source in sources:
+        for token in tokenize_blocks(source):
+            counts[token['type']] += 1
+    
+    size_mb = sum(len(source.encode('utf-8')) for source in sources) * max(1, args.repeat) / 1e6
+    print(f"📄 {len(sources)} file(s), {sum(counts.values())} tokens")
+    for token_type, count in counts.items():
+        if count:
+            print(f"   {token_type:<11} {count}")
+    print(f"⏱️  {elapsed * 1000:.1f} ms ({size_mb / elapsed if elapsed else 0:.1f} MB/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
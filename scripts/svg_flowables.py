@@ -0,0 +1,269 @@
+"""
+ReportLab flowables for diagrams (SVG drawings, forms and cached images).
+
+Split from svg_helper.py so that importing the helper does not load
+ReportLab platypus; svg_helper re-exports these classes on first access.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from reportlab.platypus import Image, Flowable
+from reportlab.lib.units import cm
+from reportlab.graphics import renderPDF
+
+import svg_helper
+from svg_helper import get_image_metadata, load_svg_drawing, svg_form_key, svg_form_pdf
+
+
+# Parsed form XObjects, one per cached PDF (pdfrw registers each once per document)
+_form_xobjects: Dict[Path, object] = {}
+
+
+class SVGDiagram(Flowable):
+    """Custom Flowable to embed SVG diagrams in PDF."""
+    
+    def __init__(self, svg_path: str, width: float = 15*cm, height: float = None):
+        """
+        Initialize SVG diagram flowable.
+        
+        Args:
+            svg_path: Path to SVG file
+            width: Desired width in ReportLab units (default 15cm)
+            height: Desired height in ReportLab units (None = auto-scale)
+        """
+        Flowable.__init__(self)
+        self.svg_path = svg_path
+        self.drawing = None
+        self.desired_width = width
+        self.desired_height = height
+        
+        # Load SVG
+        if svg_helper.SVGLIB_AVAILABLE and os.path.exists(svg_path):
+            try:
+                self.drawing = load_svg_drawing(svg_path)
+                if self.drawing:
+                    # Calculate scaling
+                    scale_w = width / self.drawing.width if self.drawing.width > 0 else 1
+                    if height:
+                        scale_h = height / self.drawing.height if self.drawing.height > 0 else 1
+                        scale = min(scale_w, scale_h)
+                    else:
+                        scale = scale_w
+                    
+                    # Apply scaling
+                    self.drawing.width = self.drawing.width * scale
+                    self.drawing.height = self.drawing.height * scale
+                    self.drawing.scale(scale, scale)
+                    
+                    # Set flowable dimensions
+                    self.width = self.drawing.width
+                    self.height = self.drawing.height
+                else:
+                    self.width = width
+                    self.height = height or (width * 0.6)  # Default aspect ratio
+            except Exception as e:
+                print(f"⚠️ Warning: Could not load SVG {svg_path}: {e}")
+                self.drawing = None
+                self.width = width
+                self.height = height or (width * 0.6)
+        else:
+            self.width = width
+            self.height = height or (width * 0.6)
+    
+    def draw(self):
+        """Render the SVG diagram on the canvas."""
+        if self.drawing:
+            try:
+                renderPDF.draw(self.drawing, self.canv, 0, 0)
+            except ValueError as e:
+                # Handle SVG rendering errors (e.g., invalid dash patterns)
+                if 'setDash' in str(e):
+                    # Fallback: Draw placeholder box with error message
+                    self._draw_placeholder(f"SVG rendering error (dash pattern)")
+                else:
+                    raise
+            except Exception as e:
+                # Fallback for any other rendering errors
+                self._draw_placeholder(f"SVG rendering error: {str(e)[:50]}")
+        else:
+            # Fallback: Draw placeholder box
+            self._draw_placeholder(f"SVG diagram: {Path(self.svg_path).name}")
+    
+    def _draw_placeholder(self, text: str):
+        """Draw a placeholder box when SVG rendering fails."""
+        self.canv.saveState()
+        self.canv.setStrokeColorRGB(0.8, 0.8, 0.8)
+        self.canv.setFillColorRGB(0.95, 0.95, 0.95)
+        self.canv.rect(0, 0, self.width, self.height, fill=1)
+        
+        # Add text
+        self.canv.setFillColorRGB(0.4, 0.4, 0.4)
+        self.canv.setFont("Helvetica", 10)
+        text_width = self.canv.stringWidth(text, "Helvetica", 10)
+        self.canv.drawString((self.width - text_width) / 2, 
+                            self.height / 2, text)
+        self.canv.restoreState()
+
+
+
+class CachedImage(Image):
+    """
+    Image flowable sized from cached metadata instead of the image file.
+    
+    The file is first read when the PDF is written, and it is drawn by
+    filename so ReportLab embeds (and decodes) each file only once.
+    """
+    
+    def __init__(self, filename: str, width: float, height: float, metadata: Dict, **kwargs):
+        """
+        Args:
+            filename: Path to the raster image
+            width: Draw width in ReportLab units
+            height: Draw height in ReportLab units
+            metadata: Image metadata (see get_image_metadata)
+        """
+        Image.__init__(self, filename, width=width, height=height, **kwargs)
+        self.imageWidth = metadata['width']
+        self.imageHeight = metadata['height']
+        self.drawWidth = width
+        self.drawHeight = height
+    
+    def draw(self):
+        """Draw by filename: repeated images share one XObject."""
+        self.canv.drawImage(self.filename,
+                            getattr(self, '_offs_x', 0),
+                            getattr(self, '_offs_y', 0),
+                            self.drawWidth,
+                            self.drawHeight,
+                            mask=self._mask)
+
+
+
+class LazySVGDiagram(SVGDiagram):
+    """
+    SVGDiagram that is sized from cached metadata and parsed only when drawn.
+    
+    wrap() uses the SVG's width/height or viewBox from the metadata cache;
+    draw() loads the Drawing (through the drawing cache), renders it and
+    drops it again, so only the diagram on the current page is in memory.
+    """
+    
+    def __init__(self, svg_path: str, width: float = 15*cm, height: float = None,
+                 metadata: Optional[Dict] = None):
+        """
+        Initialize lazy SVG diagram flowable.
+        
+        Args:
+            svg_path: Path to SVG file
+            width: Desired width in ReportLab units (default 15cm)
+            height: Desired height in ReportLab units (None = auto-scale)
+            metadata: Cached SVG metadata (looked up if omitted)
+        """
+        Flowable.__init__(self)
+        self.svg_path = svg_path
+        self.drawing = None
+        self.desired_width = width
+        self.desired_height = height
+        self.metadata = metadata or get_image_metadata(svg_path)
+        self.width = width
+        self.height = height or (width * 0.6)  # Default aspect ratio
+    
+    def wrap(self, availWidth, availHeight):
+        """Size from the SVG's intrinsic dimensions without parsing it."""
+        if self.metadata:
+            scale = self.desired_width / self.metadata['width']
+            if self.desired_height:
+                scale = min(scale, self.desired_height / self.metadata['height'])
+            self.width = self.metadata['width'] * scale
+            self.height = self.metadata['height'] * scale
+        return self.width, self.height
+    
+    def draw(self):
+        """Load, scale and render the SVG, then release the Drawing."""
+        if svg_helper.SVGLIB_AVAILABLE and os.path.exists(self.svg_path):
+            try:
+                self.drawing = load_svg_drawing(self.svg_path)
+                if self.drawing and self.drawing.width > 0 and self.drawing.height > 0:
+                    scale = min(self.width / self.drawing.width, self.height / self.drawing.height)
+                    self.drawing.scale(scale, scale)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not load SVG {self.svg_path}: {e}")
+                self.drawing = None
+        try:
+            SVGDiagram.draw(self)
+        finally:
+            self.drawing = None
+
+
+
+class SVGFormDiagram(LazySVGDiagram):
+    """
+    Vector diagram drawn as a reusable PDF form XObject.
+    
+    With pdfrw installed, the SVG's cached one-page PDF (svg_form_pdf) is
+    embedded, so warm builds never run svglib. Without it, the Drawing is
+    rendered into a form once per document. Either way every further
+    placement of the same SVG only references the form.
+    """
+    
+    def _register_form(self) -> Optional[Tuple[str, float, float]]:
+        """
+        Register the diagram's form in the current document.
+        
+        Returns:
+            (form name, form width, form height), or None if the SVG cannot
+            be converted (remembered, so it is not retried on every placement)
+        """
+        if not self.metadata or not svg_helper.SVGLIB_AVAILABLE:
+            return None
+        key = svg_form_key(self.metadata)
+        if key in svg_helper.form_failures:
+            return None
+        
+        canv = self.canv
+        if svg_helper.PDFRW_AVAILABLE:
+            from pdfrw import PdfReader
+            from pdfrw.buildxobj import pagexobj
+            from pdfrw.toreportlab import makerl
+            
+            form_pdf = svg_form_pdf(self.svg_path, self.metadata)
+            if not form_pdf:
+                return None
+            xobj = _form_xobjects.get(form_pdf)
+            if xobj is None:
+                xobj = _form_xobjects[form_pdf] = pagexobj(PdfReader(str(form_pdf)).pages[0])
+            bbox = [float(v) for v in xobj.BBox]
+            return makerl(canv, xobj), bbox[2] - bbox[0], bbox[3] - bbox[1]
+        
+        name = f"svg{key}".replace('.', '_')
+        if not canv._doc.hasForm(name):
+            drawing = load_svg_drawing(self.svg_path)
+            if drawing is None:
+                svg_helper.form_failures.add(key)
+                return None
+            canv.beginForm(name, 0, 0, drawing.width, drawing.height)
+            try:
+                renderPDF.draw(drawing, canv, 0, 0)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not embed {Path(self.svg_path).name} as a form: {e}")
+                svg_helper.form_failures.add(key)
+                return None
+            finally:
+                # Always close the form so the page stream is restored
+                canv.endForm()
+        return name, self.metadata['width'], self.metadata['height']
+    
+    def draw(self):
+        """Place the diagram's form, falling back to rendering the Drawing."""
+        form = self._register_form()
+        if not form:
+            LazySVGDiagram.draw(self)
+            return
+        
+        name, form_width, form_height = form
+        self.canv.saveState()
+        self.canv.scale(self.width / form_width, self.height / form_height)
+        self.canv.doForm(name)
+        self.canv.restoreState()
+
@@ -3,143 +3,908 @@ SVG to ReportLab Integration Helper
 
 Converts SVG diagrams to ReportLab Drawing objects for PDF embedding.
 Requires: pip install svglib reportlab
+
+Heavy backends (ReportLab platypus, svglib, PIL, pdfrw) are imported on
+first use; the flowable classes live in svg_flowables.py and are also
+available from this module (e.g., svg_helper.SVGDiagram).
 """
 
+import hashlib
+import io
+import json
 import os
+import pickle
+import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.util import find_spec
 from pathlib import Path
-from typing import Optional, Tuple
-from reportlab.platypus import Image, Flowable
-from reportlab.lib.units import cm
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+# reportlab.lib.units.cm, without importing ReportLab at startup
+cm = 72.0 / 2.54
+
+# Optional backends are only located here; they are imported when first needed
+SVGLIB_AVAILABLE = find_spec('svglib') is not None and find_spec('reportlab') is not None
+# Optional: embed cached one-page PDFs of SVG diagrams as form XObjects
+PDFRW_AVAILABLE = find_spec('pdfrw') is not None
+
+# Flowable classes re-exported lazily from svg_flowables (they subclass ReportLab classes)
+FLOWABLE_CLASSES = ('SVGDiagram', 'CachedImage', 'LazySVGDiagram', 'SVGFormDiagram')
+
+
+def __getattr__(name: str):
+    """Import svg_flowables the first time one of its classes is requested."""
+    if name in FLOWABLE_CLASSES:
+        import svg_flowables
+        return getattr(svg_flowables, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-try:
-    from svglib.svglib import svg2rlg
-    from reportlab.graphics import renderPDF
-    SVGLIB_AVAILABLE = True
-except ImportError:
-    SVGLIB_AVAILABLE = False
+
+_pil_module = None
+
+
+def pil_image():
+    """
+    PIL.Image, imported once on first use.
+    
+    Returns:
+        The PIL.Image module (raises ImportError if Pillow is not installed)
+    """
+    global _pil_module
+    if _pil_module is None:
+        from PIL import Image as PILImage
+        _pil_module = PILImage
+    return _pil_module
+
+
+# Written by generate_diagram_images.py: duplicate diagram stem -> canonical stem
+ALIAS_MANIFEST = "aliases.json"
+_alias_cache: Dict[Path, Tuple[float, Dict[str, str]]] = {}
+
+
+def load_diagram_aliases(images_dir: Path) -> Dict[str, str]:
+    """
+    Load the alias manifest of a diagram images directory.
+    
+    Args:
+        images_dir: Generated images directory (e.g., DIAGRAMS/images)
+        
+    Returns:
+        Mapping of duplicate diagram names to their canonical name
+    """
+    manifest = Path(images_dir) / ALIAS_MANIFEST
+    try:
+        mtime = manifest.stat().st_mtime
+    except OSError:
+        return {}
+    
+    cached = _alias_cache.get(manifest)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    try:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        aliases = data.get('aliases', {}) if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        aliases = {}
+    _alias_cache[manifest] = (mtime, aliases)
+    return aliases
 
 
-class SVGDiagram(Flowable):
-    """Custom Flowable to embed SVG diagrams in PDF."""
+def canonical_image_path(image_path: Path) -> Path:
+    """
+    Resolve an image of a duplicate diagram to the canonical diagram's image.
     
-    def __init__(self, svg_path: str, width: float = 15*cm, height: float = None):
+    Args:
+        image_path: Image path (e.g., DIAGRAMS/images/png/automation-mesh.png)
+        
+    Returns:
+        Canonical image path if it exists, otherwise image_path unchanged
+    """
+    image_path = Path(image_path)
+    canonical = load_diagram_aliases(image_path.parent.parent).get(image_path.stem)
+    if canonical:
+        candidate = image_path.with_name(f"{canonical}{image_path.suffix}")
+        if candidate.exists():
+            return candidate
+    return image_path
+
+
+# Relative to the images directory (e.g., DIAGRAMS/images/.cache/image-metadata.json)
+IMAGE_CACHE_DIR = ".cache"
+IMAGE_METADATA_FILE = Path(IMAGE_CACHE_DIR) / "image-metadata.json"
+
+# max_dpi profiles for raster diagrams (None = embed originals)
+DPI_PROFILES = {
+    'screen': 150,
+    'print': 300,
+}
+
+
+def image_cache_dir(image_path: Path) -> Path:
+    """
+    Cache directory for an image: <images dir>/.cache for generated diagrams
+    (DIAGRAMS/images/png/x.png), <image dir>/.cache for anything else.
+    """
+    image_dir = Path(image_path).resolve().parent
+    if image_dir.name in ('png', 'svg'):
+        image_dir = image_dir.parent
+    return image_dir / IMAGE_CACHE_DIR
+
+
+def _tmp_path(path: Path) -> Path:
+    """Per-thread temporary name for an atomic write to path."""
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def resolve_max_dpi(max_dpi: Union[str, float, None]) -> Optional[float]:
+    """
+    Turn a max_dpi option into a number.
+    
+    Args:
+        max_dpi: Profile name ('screen', 'print'), a DPI value, or None
+        
+    Returns:
+        DPI as float, or None for no limit
+    """
+    if max_dpi is None or max_dpi == '':
+        return None
+    if isinstance(max_dpi, str) and max_dpi.lower() in DPI_PROFILES:
+        return float(DPI_PROFILES[max_dpi.lower()])
+    dpi = float(max_dpi)
+    if dpi <= 0:
+        raise ValueError(f"max_dpi must be positive or one of {', '.join(DPI_PROFILES)}: {max_dpi!r}")
+    return dpi
+
+
+SVG_ROOT_PATTERN = re.compile(rb'<svg\b[^>]*>', re.DOTALL)
+SVG_LENGTH_PATTERN = re.compile(rb'\b(width|height)\s*=\s*["\']\s*([\d.]+)\s*(?:px)?\s*["\']')
+SVG_VIEWBOX_PATTERN = re.compile(rb'\bviewBox\s*=\s*["\']([^"\']+)["\']')
+
+
+def read_svg_size(svg_data: bytes) -> Optional[Tuple[float, float]]:
+    """
+    Intrinsic size of an SVG from its root element (absolute width/height,
+    otherwise the viewBox), matching what svglib uses for the Drawing.
+    
+    Args:
+        svg_data: SVG file content
+        
+    Returns:
+        (width, height) in points, or None if the root element has no size
+    """
+    root = SVG_ROOT_PATTERN.search(svg_data)
+    if not root:
+        return None
+    lengths = {name.decode(): float(value) for name, value in SVG_LENGTH_PATTERN.findall(root.group(0))}
+    if 'width' in lengths and 'height' in lengths:
+        return lengths['width'], lengths['height']
+    viewbox = SVG_VIEWBOX_PATTERN.search(root.group(0))
+    if viewbox:
+        parts = viewbox.group(1).replace(b',', b' ').split()
+        if len(parts) == 4:
+            return float(parts[2]), float(parts[3])
+    return None
+
+
+def read_image_metadata(image_path: Path) -> Dict:
+    """
+    Read image metadata from the file header (pixels are not decoded,
+    SVGs are not parsed).
+    
+    Args:
+        image_path: Path to a PNG/JPEG/SVG image
+        
+    Returns:
+        Dict with width, height, dpi, mode and sha256 of the file content
+        (mode is "vector" for SVG)
+    """
+    data = Path(image_path).read_bytes()
+    if Path(image_path).suffix.lower() == '.svg':
+        size = read_svg_size(data)
+        if not size or size[0] <= 0 or size[1] <= 0:
+            raise ValueError(f"no width/height or viewBox in {Path(image_path).name}")
+        return {
+            'width': size[0],
+            'height': size[1],
+            'dpi': None,
+            'mode': 'vector',
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+    
+    with pil_image().open(io.BytesIO(data)) as img:
+        width, height = img.size
+        dpi = img.info.get('dpi')
+        mode = img.mode
+    return {
+        'width': width,
+        'height': height,
+        'dpi': [float(d) for d in dpi] if dpi else None,
+        'mode': mode,
+        'sha256': hashlib.sha256(data).hexdigest(),
+    }
+
+
+class ImageMetadataCache:
+    """
+    Persistent image metadata (dimensions, DPI, mode, content hash).
+    
+    Entries are keyed by path and reused while the file's mtime and size are
+    unchanged, so building flowables never has to open the image.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, cache_file: Path):
         """
-        Initialize SVG diagram flowable.
+        Load the cache file (missing or corrupt = empty).
         
         Args:
-            svg_path: Path to SVG file
-            width: Desired width in ReportLab units (default 15cm)
-            height: Desired height in ReportLab units (None = auto-scale)
+            cache_file: JSON file holding the cached entries
+        """
+        self.cache_file = Path(cache_file)
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get('version') == self.VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+    
+    def get(self, image_path: Path) -> Optional[Dict]:
+        """
+        Metadata for an image, read from the file only on a cache miss.
+        
+        Args:
+            image_path: Path to a raster image
+            
+        Returns:
+            Metadata dict, or None if the file is missing or unreadable
+        """
+        image_path = Path(image_path)
+        try:
+            stat = image_path.stat()
+        except OSError:
+            return None
+        
+        key = image_path.resolve().as_posix()
+        entry = self.entries.get(key)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry
+        
+        try:
+            entry = read_image_metadata(image_path)
+        except Exception:
+            return None
+        entry['mtime_ns'] = stat.st_mtime_ns
+        entry['size'] = stat.st_size
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+    
+    def save(self):
+        """Write the cache atomically if anything changed."""
+        if not self.dirty:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = _tmp_path(self.cache_file)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'entries': self.entries}, f, indent=2)
+                f.write('\n')
+            os.replace(tmp_file, self.cache_file)
+            self.dirty = False
+        except OSError as e:
+            print(f"⚠️ Warning: Could not save image metadata cache {self.cache_file}: {e}")
+
+
+_metadata_caches: Dict[Path, ImageMetadataCache] = {}
+_caches_lock = threading.Lock()  # guards creation of the shared per-directory caches
+
+
+def get_image_metadata(image_path: Path, cache_file: Optional[Path] = None) -> Optional[Dict]:
+    """
+    Cached metadata for an image (see ImageMetadataCache).
+    
+    Args:
+        image_path: Path to a raster image (e.g., DIAGRAMS/images/png/x.png)
+        cache_file: Cache to use (default: image-metadata.json in image_cache_dir())
+        
+    Returns:
+        Metadata dict, or None if the image cannot be read
+    """
+    image_path = Path(image_path)
+    if cache_file is None:
+        cache_file = image_cache_dir(image_path) / IMAGE_METADATA_FILE.name
+    cache_file = Path(cache_file)
+    cache = _metadata_caches.get(cache_file)
+    if cache is None:
+        with _caches_lock:
+            cache = _metadata_caches.get(cache_file)
+            if cache is None:
+                cache = _metadata_caches[cache_file] = ImageMetadataCache(cache_file)
+    return cache.get(image_path)
+
+
+def save_image_metadata():
+    """Persist every image metadata and SVG validation cache touched in this process."""
+    for cache in list(_metadata_caches.values()) + list(_validation_caches.values()):
+        cache.save()
+
+
+def downsample_image(image_path: Path, metadata: Dict, draw_width: float,
+                     draw_height: float, max_dpi: float) -> Tuple[Path, Dict]:
+    """
+    Resample a raster image to the pixel size needed at max_dpi.
+    
+    Resampled variants are cached in <image cache dir>/resampled/, named after
+    the source content hash and target size, so each is produced only once.
+    
+    Args:
+        image_path: Source raster image
+        metadata: Cached metadata of the source image
+        draw_width: Width the image is drawn at (points)
+        draw_height: Height the image is drawn at (points)
+        max_dpi: Maximum pixel density to embed
+        
+    Returns:
+        (path, metadata) of the image to embed: the original when it is
+        already small enough or cannot be resampled
+    """
+    target_width = max(1, round(draw_width / 72 * max_dpi))
+    target_height = max(1, round(draw_height / 72 * max_dpi))
+    if metadata['width'] <= target_width and metadata['height'] <= target_height:
+        return Path(image_path), metadata
+    
+    cache_dir = image_cache_dir(image_path) / "resampled"
+    resampled = cache_dir / f"{metadata['sha256'][:16]}-{target_width}x{target_height}.png"
+    if not resampled.exists():
+        try:
+            PILImage = pil_image()
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            with PILImage.open(str(image_path)) as img:
+                if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                    has_alpha = 'A' in img.mode or 'transparency' in img.info
+                    img = img.convert('RGBA' if has_alpha else 'RGB')
+                # Area averaging: sharp enough for diagrams and, unlike LANCZOS,
+                # adds no ringing that would make the flat colours compress worse
+                resampling = getattr(PILImage, 'Resampling', PILImage)
+                img = img.resize((target_width, target_height), resampling.BOX)
+                tmp_file = _tmp_path(resampled)
+                img.save(tmp_file, format='PNG', optimize=True, dpi=(max_dpi, max_dpi))
+            os.replace(tmp_file, resampled)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not resample {Path(image_path).name}: {e}")
+            return Path(image_path), metadata
+    
+    resampled_metadata = get_image_metadata(resampled, image_cache_dir(image_path) / IMAGE_METADATA_FILE.name)
+    if not resampled_metadata:
+        return Path(image_path), metadata
+    return resampled, resampled_metadata
+
+
+# Content hash -> first filename seen with that content. ReportLab names an
+# image XObject after the filename it is drawn from, so drawing every copy
+# through one filename embeds the image once per PDF.
+_shared_image_files: Dict[str, str] = {}
+
+
+def shared_image_path(image_path: Path, metadata: Optional[Dict] = None) -> str:
+    """
+    Filename to draw an image from so identical images share one XObject.
+    
+    Args:
+        image_path: Path to a raster image
+        metadata: Cached metadata for the image (looked up if omitted)
+        
+    Returns:
+        Filename of the first image with the same content (image_path if unknown)
+    """
+    metadata = metadata or get_image_metadata(image_path)
+    if not metadata:
+        return str(image_path)
+    return _shared_image_files.setdefault(metadata['sha256'], str(image_path))
+
+
+class DiagramImageIndex:
+    """
+    In-memory index of generated diagram images, built with one directory scan.
+    
+    Maps each diagram stem to its available formats so lookups need no
+    filesystem calls, and tracks which diagrams were requested so a build can
+    report missing and unused images at the end.
+    """
+    
+    # Lookup preference: PNG renders more reliably in ReportLab than SVG
+    FORMATS = ('png', 'svg')
+    
+    def __init__(self, diagrams_dir: Path):
         """
-        Flowable.__init__(self)
-        self.svg_path = svg_path
-        self.drawing = None
-        self.desired_width = width
-        self.desired_height = height
+        Scan the images directory of a diagrams tree.
         
-        # Load SVG
-        if SVGLIB_AVAILABLE and os.path.exists(svg_path):
+        Args:
+            diagrams_dir: Root diagrams directory (images live in <dir>/images/<format>/)
+        """
+        self.diagrams_dir = Path(diagrams_dir)
+        self.images_dir = self.diagrams_dir / "images"
+        self.aliases = load_diagram_aliases(self.images_dir)
+        # stem -> {"png": {"path": Path, "size": bytes}, "png@2x": {...}, "svg": {...}}
+        self.images: Dict[str, Dict[str, Dict]] = {}
+        self.referenced: Set[str] = set()
+        self.missing: Set[str] = set()
+        self.scan()
+    
+    def scan(self):
+        """(Re)build the index from the images directory."""
+        self.images = {}
+        for fmt in self.FORMATS:
             try:
-                self.drawing = svg2rlg(svg_path)
-                if self.drawing:
-                    # Calculate scaling
-                    scale_w = width / self.drawing.width if self.drawing.width > 0 else 1
-                    if height:
-                        scale_h = height / self.drawing.height if self.drawing.height > 0 else 1
-                        scale = min(scale_w, scale_h)
-                    else:
-                        scale = scale_w
-                    
-                    # Apply scaling
-                    self.drawing.width = self.drawing.width * scale
-                    self.drawing.height = self.drawing.height * scale
-                    self.drawing.scale(scale, scale)
-                    
-                    # Set flowable dimensions
-                    self.width = self.drawing.width
-                    self.height = self.drawing.height
-                else:
-                    self.width = width
-                    self.height = height or (width * 0.6)  # Default aspect ratio
-            except Exception as e:
-                print(f"⚠️ Warning: Could not load SVG {svg_path}: {e}")
-                self.drawing = None
-                self.width = width
-                self.height = height or (width * 0.6)
-        else:
-            self.width = width
-            self.height = height or (width * 0.6)
+                entries = list(os.scandir(self.images_dir / fmt))
+            except OSError:
+                continue
+            suffix = f".{fmt}"
+            for entry in entries:
+                if not entry.name.endswith(suffix) or not entry.is_file():
+                    continue
+                stem = entry.name[:-len(suffix)]
+                # Scale variants (name@2x.png) belong to the base diagram
+                stem, _, scale = stem.partition('@')
+                key = f"{fmt}@{scale}" if scale else fmt
+                self.images.setdefault(stem, {})[key] = {
+                    'path': Path(entry.path),
+                    'size': entry.stat().st_size,
+                }
+    
+    def formats(self, stem: str) -> Dict[str, Dict]:
+        """Available formats (with path and size) for a diagram stem."""
+        return self.images.get(self.aliases.get(stem, stem), {})
+    
+    def lookup(self, diagram_path: str, prefer_vector: bool = False,
+               record: bool = True) -> Optional[Path]:
+        """
+        Find the image for a diagram reference and record the reference.
+        
+        Args:
+            diagram_path: Path from markdown (e.g., "DIAGRAMS/ai-native-safe-model.mmd")
+            prefer_vector: Try SVG before PNG (print builds)
+            record: Count the lookup in report() (False for prefetching)
+            
+        Returns:
+            Path to the preferred image, None if the diagram has no image
+        """
+        base_name = Path(diagram_path).stem if diagram_path.endswith('.mmd') else Path(diagram_path).name
+        base_name = self.aliases.get(base_name, base_name)
+        if record:
+            self.referenced.add(base_name)
+        
+        available = self.images.get(base_name, {})
+        for fmt in (reversed(self.FORMATS) if prefer_vector else self.FORMATS):
+            if fmt in available:
+                return available[fmt]['path']
+        
+        if record:
+            self.missing.add(base_name)
+        return None
+    
+    def report(self) -> Dict:
+        """
+        Summarize image usage for everything looked up so far.
+        
+        Returns:
+            Dict with referenced/missing/unused diagram stems and unused bytes
+        """
+        aliased = set(self.aliases)
+        unused = sorted(stem for stem in self.images
+                        if stem not in self.referenced and stem not in aliased)
+        return {
+            'indexed': len(self.images),
+            'referenced': sorted(self.referenced),
+            'missing': sorted(self.missing),
+            'unused': unused,
+            'unused_bytes': sum(entry['size'] for stem in unused
+                                for entry in self.images[stem].values()),
+        }
+
+
+_image_indexes: Dict[Path, DiagramImageIndex] = {}
+
+
+def get_diagram_image_index(diagrams_dir: Path, refresh: bool = False) -> DiagramImageIndex:
+    """
+    Shared image index for a diagrams directory (scanned once per process).
+    
+    Args:
+        diagrams_dir: Root diagrams directory
+        refresh: Rescan even if an index already exists
+        
+    Returns:
+        DiagramImageIndex for the directory
+    """
+    key = Path(diagrams_dir).resolve()
+    with _caches_lock:
+        index = _image_indexes.get(key)
+        if index is None or refresh:
+            index = _image_indexes[key] = DiagramImageIndex(key)
+    return index
+
+
+def svglib_version() -> str:
+    """Installed svglib version (part of the drawing cache key)."""
+    try:
+        from importlib.metadata import version
+        return version('svglib')
+    except Exception:
+        return 'unknown'
+
+
+class DrawingCache:
+    """
+    Cache of svg2rlg conversions.
+    
+    Drawings are pickled to <image cache dir>/drawings/, keyed by the SVG
+    content hash and the svglib version, and the most recently used pickles
+    are also kept in memory. Every load returns a fresh Drawing because
+    callers scale it in place.
+    """
     
-    def draw(self):
-        """Render the SVG diagram on the canvas."""
-        if self.drawing:
+    def __init__(self, max_entries: int = 32):
+        """
+        Args:
+            max_entries: Pickled drawings kept in the in-process LRU
+        """
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._svglib_version: Optional[str] = None
+    
+    def key(self, svg_data: bytes) -> str:
+        """Cache key for SVG content under the installed svglib."""
+        return self.key_for_digest(hashlib.sha256(svg_data).hexdigest())
+    
+    def key_for_digest(self, sha256: str) -> str:
+        """Cache key for an SVG whose content hash is already known."""
+        if self._svglib_version is None:
+            self._svglib_version = svglib_version()
+        return f"{sha256[:32]}-svglib{self._svglib_version}"
+    
+    def load(self, svg_path: str):
+        """
+        Convert an SVG file to a ReportLab Drawing, parsing it only on a cache miss.
+        
+        Args:
+            svg_path: Path to SVG file
+            
+        Returns:
+            Drawing, or None if svglib could not convert the file
+        """
+        svg_data = Path(svg_path).read_bytes()
+        key = self.key(svg_data)
+        
+        with self._lock:
+            blob = self._lru.get(key)
+            if blob is not None:
+                self._lru.move_to_end(key)
+        if blob is not None:
+            return pickle.loads(blob)
+        
+        cache_file = image_cache_dir(svg_path) / "drawings" / f"{key}.pickle"
+        try:
+            blob = cache_file.read_bytes()
+            drawing = pickle.loads(blob)
+        except Exception:
+            blob = None
+        
+        if blob is None:
+            from svglib.svglib import svg2rlg
+            drawing = svg2rlg(svg_path)
+            if drawing is None:
+                return None
             try:
-                renderPDF.draw(self.drawing, self.canv, 0, 0)
-            except ValueError as e:
-                # Handle SVG rendering errors (e.g., invalid dash patterns)
-                if 'setDash' in str(e):
-                    # Fallback: Draw placeholder box with error message
-                    self._draw_placeholder(f"SVG rendering error (dash pattern)")
-                else:
-                    raise
+                blob = pickle.dumps(drawing, protocol=pickle.HIGHEST_PROTOCOL)
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = _tmp_path(cache_file)
+                tmp_file.write_bytes(blob)
+                os.replace(tmp_file, cache_file)
             except Exception as e:
-                # Fallback for any other rendering errors
-                self._draw_placeholder(f"SVG rendering error: {str(e)[:50]}")
-        else:
-            # Fallback: Draw placeholder box
-            self._draw_placeholder(f"SVG diagram: {Path(self.svg_path).name}")
+                print(f"⚠️ Warning: Could not cache drawing for {Path(svg_path).name}: {e}")
+                if blob is None:
+                    return drawing
+        
+        with self._lock:
+            self._lru[key] = blob
+            if len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+        return drawing
+
+
+_drawing_cache = DrawingCache()
+
+
+def load_svg_drawing(svg_path: str):
+    """
+    Cached svg2rlg (see DrawingCache).
+    
+    Args:
+        svg_path: Path to SVG file
+        
+    Returns:
+        Fresh ReportLab Drawing, or None if the SVG could not be converted
+    """
+    return _drawing_cache.load(svg_path)
+
+
+def shared_image(image_path: Path, width: float = None, height: float = None,
+                 kind: str = 'direct', max_dpi: Union[str, float, None] = None,
+                 **kwargs) -> "Image":
+    """
+    Image flowable that is decoded and embedded once per unique image.
+    
+    Drop-in replacement for reportlab.platypus.Image for raster files.
+    
+    Args:
+        image_path: Path to a raster image
+        width: Draw width (None = image width)
+        height: Draw height (None = image height)
+        kind: 'direct' or 'proportional'/'bound' (fit inside width x height)
+        max_dpi: Downsample to this density ('screen', 'print' or a DPI value)
+        **kwargs: Extra Image arguments (mask, hAlign, ...)
+        
+    Returns:
+        CachedImage, or a plain Image if the metadata cannot be read
+    """
+    from reportlab.platypus import Image
+    from svg_flowables import CachedImage
+    
+    metadata = get_image_metadata(image_path)
+    if not metadata or kind not in ('direct', 'absolute', 'proportional', 'bound'):
+        return Image(str(image_path), width=width, height=height, kind=kind, **kwargs)
+    
+    image_width, image_height = metadata['width'], metadata['height']
+    if kind in ('proportional', 'bound'):
+        factor = min(float(width) / image_width, float(height) / image_height)
+        draw_width, draw_height = image_width * factor, image_height * factor
+    else:
+        draw_width, draw_height = width or image_width, height or image_height
+    
+    max_dpi = resolve_max_dpi(max_dpi)
+    if max_dpi:
+        image_path, metadata = downsample_image(image_path, metadata, draw_width,
+                                                draw_height, max_dpi)
+    return CachedImage(shared_image_path(image_path, metadata), draw_width, draw_height,
+                       metadata, **kwargs)
+
+
+# Drawing cache keys of SVGs that svglib/renderPDF could not convert
+form_failures: Set[str] = set()
+
+
+def svg_form_key(metadata: Dict) -> str:
+    """Drawing cache key of an SVG (also names its form PDF and form XObject)."""
+    return _drawing_cache.key_for_digest(metadata['sha256'])
+
+
+def svg_form_pdf(svg_path: str, metadata: Optional[Dict] = None) -> Optional[Path]:
+    """
+    Convert an SVG once into a standalone one-page PDF (cached on disk).
+    
+    The page is the size of the Drawing, so it can be placed as a form
+    XObject and scaled freely while staying vector.
+    
+    Args:
+        svg_path: Path to SVG file
+        metadata: Cached SVG metadata (looked up if omitted)
+        
+    Returns:
+        Path to <image cache dir>/forms/<key>.pdf, or None if conversion failed
+    """
+    metadata = metadata or get_image_metadata(svg_path)
+    if not metadata or not SVGLIB_AVAILABLE:
+        return None
+    key = svg_form_key(metadata)
+    if key in form_failures:
+        return None
+    form_pdf = image_cache_dir(svg_path) / "forms" / f"{key}.pdf"
+    if form_pdf.exists():
+        return form_pdf
+    
+    try:
+        drawing = load_svg_drawing(svg_path)
+        if drawing is None:
+            form_failures.add(key)
+            return None
+        from reportlab.graphics import renderPDF
+        form_pdf.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = _tmp_path(form_pdf)
+        renderPDF.drawToFile(drawing, str(tmp_file), showBoundary=0)
+        os.replace(tmp_file, form_pdf)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not convert {Path(svg_path).name} to PDF: {e}")
+        form_failures.add(key)
+        return None
+    return form_pdf
+
+
+SVG_VALIDATION_FILE = "svg-validation.json"
+
+
+class SVGValidationCache:
+    """
+    Persistent trial-render verdicts for SVG diagrams.
+    
+    Keyed like the drawing cache (SVG content hash + svglib version), so a
+    verdict is computed once per SVG content and reused by every build.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, cache_file: Path):
+        """
+        Load the cache file (missing or corrupt = empty).
+        
+        Args:
+            cache_file: JSON file holding the verdicts
+        """
+        self.cache_file = Path(cache_file)
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get('version') == self.VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+    
+    def verdict(self, svg_path: str, metadata: Dict) -> Dict:
+        """
+        Trial-render an SVG (only on a cache miss) and return the verdict.
+        
+        Args:
+            svg_path: Path to SVG file
+            metadata: Cached SVG metadata (provides the content hash)
+            
+        Returns:
+            Dict with ok (bool), error (str or None) and the SVG file name
+        """
+        key = _drawing_cache.key_for_digest(metadata['sha256'])
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+        
+        error = None
+        try:
+            drawing = load_svg_drawing(svg_path)
+            if drawing is None:
+                error = "svglib could not convert the file"
+            else:
+                from reportlab.graphics import renderPDF
+                from reportlab.pdfgen.canvas import Canvas
+                renderPDF.draw(drawing, Canvas(io.BytesIO()), 0, 0)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}".splitlines()[0]
+        
+        entry = {'ok': error is None, 'error': error, 'svg': Path(svg_path).name}
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+    
+    def save(self):
+        """Write the cache atomically if anything changed."""
+        if not self.dirty:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = _tmp_path(self.cache_file)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'entries': self.entries}, f, indent=2)
+                f.write('\n')
+            os.replace(tmp_file, self.cache_file)
+            self.dirty = False
+        except OSError as e:
+            print(f"⚠️ Warning: Could not save SVG validation cache {self.cache_file}: {e}")
+
+
+_validation_caches: Dict[Path, SVGValidationCache] = {}
+
+
+def validate_svg(svg_path: str, metadata: Optional[Dict] = None) -> Dict:
+    """
+    Whether svglib + renderPDF can draw an SVG (cached verdict, see SVGValidationCache).
     
-    def _draw_placeholder(self, text: str):
-        """Draw a placeholder box when SVG rendering fails."""
-        self.canv.saveState()
-        self.canv.setStrokeColorRGB(0.8, 0.8, 0.8)
-        self.canv.setFillColorRGB(0.95, 0.95, 0.95)
-        self.canv.rect(0, 0, self.width, self.height, fill=1)
+    Args:
+        svg_path: Path to SVG file
+        metadata: Cached SVG metadata (looked up if omitted)
         
-        # Add text
-        self.canv.setFillColorRGB(0.4, 0.4, 0.4)
-        self.canv.setFont("Helvetica", 10)
-        text_width = self.canv.stringWidth(text, "Helvetica", 10)
-        self.canv.drawString((self.width - text_width) / 2, 
-                            self.height / 2, text)
-        self.canv.restoreState()
+    Returns:
+        Dict with ok (bool), error (str or None) and svg (file name)
+    """
+    if not SVGLIB_AVAILABLE:
+        return {'ok': False, 'error': "svglib not installed", 'svg': Path(svg_path).name}
+    metadata = metadata or get_image_metadata(svg_path)
+    if not metadata:
+        return {'ok': False, 'error': "unreadable SVG (no size)", 'svg': Path(svg_path).name}
+    
+    cache_file = image_cache_dir(svg_path) / SVG_VALIDATION_FILE
+    cache = _validation_caches.get(cache_file)
+    if cache is None:
+        with _caches_lock:
+            cache = _validation_caches.get(cache_file)
+            if cache is None:
+                cache = _validation_caches[cache_file] = SVGValidationCache(cache_file)
+    return cache.verdict(str(svg_path), metadata)
 
 
-def find_svg_for_diagram(diagram_path: str, diagrams_dir: Path) -> Optional[Path]:
+def validate_svg_directory(svg_dir: Path) -> Dict[str, Dict]:
+    """
+    Validate every SVG in a directory and persist the verdicts.
+    
+    Args:
+        svg_dir: Directory of SVG diagrams (e.g., DIAGRAMS/images/svg)
+        
+    Returns:
+        Mapping of SVG file name to its verdict
+    """
+    results = {svg.name: validate_svg(str(svg)) for svg in sorted(Path(svg_dir).glob("*.svg"))}
+    save_image_metadata()
+    return results
+
+
+def find_svg_for_diagram(diagram_path: str, diagrams_dir: Path,
+                         prefer_vector: bool = False, record: bool = True) -> Optional[Path]:
     """
     Find corresponding image file for a .mmd diagram reference.
     Prefers PNG over SVG for more reliable PDF rendering.
+    Lookups go through the shared DiagramImageIndex (no per-call stat).
     
     Args:
         diagram_path: Path from markdown (e.g., "DIAGRAMS/ai-native-safe-model.mmd")
         diagrams_dir: Root diagrams directory
+        prefer_vector: Prefer SVG over PNG (keeps diagrams vector in print builds)
+        record: Count the reference in the image usage report
         
     Returns:
         Path to image file if found, None otherwise
     """
-    # Extract base filename (without .mmd extension)
-    if diagram_path.endswith('.mmd'):
-        base_name = Path(diagram_path).stem
-    else:
-        base_name = Path(diagram_path).name
-    
-    # Try PNG first (more reliable rendering in ReportLab)
-    png_path = diagrams_dir / "images" / "png" / f"{base_name}.png"
-    if png_path.exists():
-        return png_path
-    
-    # Try SVG as fallback
-    svg_path = diagrams_dir / "images" / "svg" / f"{base_name}.svg"
-    if svg_path.exists():
-        return svg_path
+    return get_diagram_image_index(diagrams_dir).lookup(diagram_path, prefer_vector, record)
+
+
+# Tallest a diagram is drawn (~6 inches), so it fits a page with margins
+MAX_DIAGRAM_HEIGHT = 16*cm
+
+
+def diagram_raster_size(metadata: Dict, width: float) -> Tuple[float, float]:
+    """
+    Draw size for a raster diagram: full width, capped at 16cm height.
     
-    return None
+    Args:
+        metadata: Cached image metadata
+        width: Desired width
+        
+    Returns:
+        (width, height) to draw the image at
+    """
+    aspect_ratio = metadata['height'] / metadata['width']
+    calc_height = width * aspect_ratio
+    # Limit height to avoid page overflow
+    max_height = MAX_DIAGRAM_HEIGHT
+    if calc_height > max_height:
+        calc_height = max_height
+        width = max_height / aspect_ratio
+    return width, calc_height
 
 
 def create_diagram_flowable(diagram_path: str, 
                             diagrams_dir: Path,
                             width: float = 15*cm,
-                            height: float = None) -> Tuple[Optional[Flowable], str]:
+                            height: float = None,
+                            max_dpi: Union[str, float, None] = None,
+                            prefer_vector: bool = False) -> Tuple[Optional["Flowable"], str]:
     """
     Create a flowable for a diagram (PNG preferred, SVG fallback).
     
@@ -148,6 +913,9 @@ def create_diagram_flowable(diagram_path: str,
         diagrams_dir: Root diagrams directory
         width: Desired width
         height: Desired height (None = auto)
+        max_dpi: Downsample rasters to this density ('screen' = 150,
+            'print' = 300, or a DPI value; None = embed the original)
+        prefer_vector: Use the SVG (as a form XObject) when both formats exist
         
     Returns:
         Tuple of (flowable, diagram_name) or (None, diagram_name) if not found
@@ -157,43 +925,173 @@ def create_diagram_flowable(diagram_path: str,
     diagram_name = base_name.replace('-', ' ').replace('_', ' ').title()
     
     # Find image file (PNG preferred)
-    image_path = find_svg_for_diagram(diagram_path, diagrams_dir)
+    image_path = find_svg_for_diagram(diagram_path, diagrams_dir, prefer_vector)
     
     if not image_path:
         return None, diagram_name
     
-    # Create appropriate flowable
+    # SVGs that fail a trial render (cached verdict) are replaced by the PNG
+    # up front, or left to the caller's placeholder, instead of failing at draw time
+    if image_path.suffix.lower() == '.svg' and SVGLIB_AVAILABLE:
+        if not validate_svg(str(image_path))['ok']:
+            png = get_diagram_image_index(diagrams_dir).formats(Path(image_path).stem).get('png')
+            if not png:
+                return None, diagram_name
+            image_path = png['path']
+    
+    # Create appropriate flowable (ReportLab is imported on the first diagram)
+    from reportlab.platypus import Image
+    from svg_flowables import CachedImage, SVGFormDiagram
+    
     # Always use Image for both PNG and SVG (more reliable)
     if image_path.suffix.lower() in ['.png', '.jpg', '.jpeg']:
         # For raster images, constrain to page width and reasonable height
-        from PIL import Image as PILImage
-        try:
-            with PILImage.open(str(image_path)) as img:
-                aspect_ratio = img.height / img.width
-                calc_height = width * aspect_ratio
-                # Limit height to avoid page overflow (max 16cm ~= 6 inches)
-                max_height = 16*cm
-                if calc_height > max_height:
-                    calc_height = max_height
-                    width = max_height / aspect_ratio
-                return Image(str(image_path), width=width, height=calc_height), diagram_name
-        except:
+        # (dimensions come from the metadata cache, not from decoding the file)
+        metadata = get_image_metadata(image_path)
+        if metadata:
+            width, calc_height = diagram_raster_size(metadata, width)
+            max_dpi = resolve_max_dpi(max_dpi)
+            if max_dpi:
+                image_path, metadata = downsample_image(image_path, metadata, width,
+                                                        calc_height, max_dpi)
+            return CachedImage(shared_image_path(image_path, metadata), width, calc_height,
+                               metadata), diagram_name
+        else:
             # Fallback: Let ReportLab auto-calculate, but this might fail
             return Image(str(image_path), width=width), diagram_name
     elif image_path.suffix.lower() == '.svg':
-        # For SVG, try using Image class first (works in newer ReportLab)
+        # Vector diagrams become one form XObject per document, built when first drawn
+        # (wrap() scales to fit both the width and the same height cap as rasters)
+        if SVGLIB_AVAILABLE:
+            height = min(height, MAX_DIAGRAM_HEIGHT) if height else MAX_DIAGRAM_HEIGHT
+            return SVGFormDiagram(str(image_path), width, height), diagram_name
+        # Without svglib, try the Image class (works in newer ReportLab)
         try:
             return Image(str(image_path), width=width), diagram_name
         except:
-            # Fallback to SVGDiagram if Image doesn't support SVG
-            if SVGLIB_AVAILABLE:
-                return SVGDiagram(str(image_path), width, height), diagram_name
-            else:
-                return None, diagram_name
+            return None, diagram_name
     else:
         return None, diagram_name
 
 
+DIAGRAM_REFERENCE_PATTERN = re.compile(r'--8<--\s*"?([^"\n]+\.mmd)"?')
+
+
+def find_diagram_references(markdown: str) -> List[str]:
+    """
+    All `--8<--` diagram references in a markdown document, in order.
+    
+    Args:
+        markdown: Markdown source
+        
+    Returns:
+        Referenced paths (e.g., ["DIAGRAMS/ai-native-safe-model.mmd"])
+    """
+    return DIAGRAM_REFERENCE_PATTERN.findall(markdown)
+
+
+class DiagramFlowableBatch:
+    """
+    Diagram flowables prepared on a thread pool ahead of use.
+    
+    Each unique reference is resolved in the background: image lookup,
+    metadata, DPI resampling, and SVG conversion (drawing / form PDF caches).
+    get() waits for that work and then builds the flowable from the warm
+    caches, so every call returns a fresh flowable cheaply.
+    """
+    
+    def __init__(self, references: List[str], diagrams_dir: Path,
+                 width: float = 15*cm, height: float = None,
+                 max_dpi: Union[str, float, None] = None,
+                 prefer_vector: bool = False, max_workers: int = 0):
+        """
+        Start preparing diagrams.
+        
+        Args:
+            references: Diagram references (duplicates are prepared once)
+            diagrams_dir: Root diagrams directory
+            width: Desired width (as for create_diagram_flowable)
+            height: Desired height (None = auto)
+            max_dpi: Downsample rasters to this density
+            prefer_vector: Use SVGs when both formats exist
+            max_workers: Pool size (0 = one per CPU core, at most 8)
+        """
+        self.diagrams_dir = Path(diagrams_dir)
+        self.options = {'width': width, 'height': height, 'max_dpi': max_dpi,
+                        'prefer_vector': prefer_vector}
+        self.max_dpi = resolve_max_dpi(max_dpi)
+        unique = list(dict.fromkeys(references))
+        workers = max_workers or min(8, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(unique) or 1)))
+        self.futures: Dict[str, Future] = {ref: self._pool.submit(self._prepare, ref)
+                                           for ref in unique}
+        self._pool.shutdown(wait=False)
+    
+    def _prepare(self, reference: str):
+        """Warm every cache create_diagram_flowable will hit for a reference."""
+        image_path = find_svg_for_diagram(reference, self.diagrams_dir,
+                                          self.options['prefer_vector'], record=False)
+        if not image_path:
+            return
+        metadata = get_image_metadata(image_path)
+        if not metadata:
+            return
+        if image_path.suffix.lower() == '.svg':
+            # The trial render also fills the drawing cache
+            if SVGLIB_AVAILABLE and validate_svg(str(image_path), metadata)['ok']:
+                if PDFRW_AVAILABLE:
+                    svg_form_pdf(str(image_path), metadata)
+                return
+            png = get_diagram_image_index(self.diagrams_dir).formats(image_path.stem).get('png')
+            if not png:
+                return
+            image_path, metadata = png['path'], get_image_metadata(png['path'])
+            if not metadata:
+                return
+        if self.max_dpi:
+            width, height = diagram_raster_size(metadata, self.options['width'])
+            downsample_image(image_path, metadata, width, height, self.max_dpi)
+    
+    def get(self, reference: str) -> Tuple[Optional["Flowable"], str]:
+        """
+        Flowable for a diagram reference (same result as create_diagram_flowable).
+        
+        Args:
+            reference: Path from markdown (e.g., "DIAGRAMS/ai-native-safe-model.mmd")
+            
+        Returns:
+            Tuple of (flowable, diagram_name) or (None, diagram_name) if not found
+        """
+        future = self.futures.get(reference)
+        if future is not None:
+            try:
+                future.result()
+            except Exception as e:
+                # Preparation is only a warm-up; the flowable is still built below
+                print(f"⚠️ Warning: Could not prepare diagram {reference}: {e}")
+        return create_diagram_flowable(reference, self.diagrams_dir, **self.options)
+    
+    def close(self):
+        """Wait for outstanding preparation work."""
+        self._pool.shutdown(wait=True)
+
+
+def prepare_diagram_flowables(references: List[str], diagrams_dir: Path,
+                              **options) -> DiagramFlowableBatch:
+    """
+    Start preparing diagram flowables for a whole book in the background.
+    
+    Args:
+        references: Every diagram reference in the book (see find_diagram_references)
+        diagrams_dir: Root diagrams directory
+        **options: width, height, max_dpi, prefer_vector, max_workers
+        
+    Returns:
+        DiagramFlowableBatch; call get(reference) where each diagram is placed
+    """
+    return DiagramFlowableBatch(references, diagrams_dir, **options)
+
+
 def check_dependencies() -> bool:
     """
     Check if SVG dependencies are available.
@@ -212,3 +1110,33 @@ def install_instructions() -> str:
         Installation command string
     """
     return "pip install svglib reportlab"
+
+
+def main() -> int:
+    """Validate SVG diagrams: python scripts/svg_helper.py --validate [SVG_DIR]"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='SVG diagram helper for the PDF generators')
+    parser.add_argument('--validate', nargs='?', const='DIAGRAMS/images/svg', metavar='SVG_DIR',
+                        help='Trial-render every SVG and cache the verdicts '
+                             '(default: DIAGRAMS/images/svg)')
+    args = parser.parse_args()
+    
+    if not args.validate:
+        parser.print_help()
+        return 0
+    if not SVGLIB_AVAILABLE:
+        print(f"❌ svglib is required for validation ({install_instructions()})")
+        return 1
+    
+    results = validate_svg_directory(Path(args.validate))
+    failed = {name: r for name, r in results.items() if not r['ok']}
+    for name, result in failed.items():
+        print(f"❌ {name}: {result['error']}")
+    print(f"✅ {len(results) - len(failed)}/{len(results)} SVG diagrams render cleanly"
+          + (f"; {len(failed)} will use PNG or a placeholder" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())